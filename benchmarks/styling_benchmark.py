@@ -0,0 +1,98 @@
+"""
+Benchmark the tree-based styling stage against the old regex chain.
+
+    python benchmarks/styling_benchmark.py [notes.md ...] [--copies N] [--repeat N]
+
+Without files, the markdown sources under My_Study_Notes are used. The notes
+are repeated --copies times to simulate a large unit.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import markdown2  # noqa: E402
+
+import md_log  # noqa: E402
+import styling  # noqa: E402
+
+LEGACY_TERMS = list(styling.DEFAULT_TERMS)
+
+
+def legacy_preview(text):
+    """The regex chain process_html_for_styling used to run (one pass per rule and term)."""
+    for pattern in [
+        r'<p>([^<]*Analogy:[^<]*)</p>',
+        r'<p>([^<]*\([^)]*Analogy[^)]*\)[^<]*)</p>',
+        r'<p>([^<]*Real-World[^<]*)</p>',
+        r'<p>([^<]*Real World[^<]*)</p>',
+    ]:
+        text = re.sub(pattern, r'<div class="sticky-note"><p>\1</p></div>', text, flags=re.IGNORECASE)
+    for tag, keyword, css_class in [
+        ("h2", "Summary", "summary"), ("h3", "Summary", "summary"),
+        ("h2", "Example", "example"), ("h3", "Example", "example"),
+        ("h2", "Mechanism", "mechanism"), ("h2", "How [iI]t [wW]orks", "mechanism"),
+    ]:
+        text = re.sub(
+            rf'<{tag}>([^<]*{keyword}[^<]*)</{tag}>',
+            rf'<{tag} class="concept-header {css_class}">\1</{tag}>',
+            text, flags=re.IGNORECASE,
+        )
+    text = text.replace('<blockquote>', '<div class="info-card"><blockquote>')
+    text = text.replace('</blockquote>', '</blockquote></div>')
+    text = re.sub(r'"([^"]+)"', r'<span class="quoted-text">"\1"</span>', text)
+    for term in LEGACY_TERMS:
+        text = re.sub(rf'\b({term})\b', r'<span class="term-pill">\1</span>', text, flags=re.IGNORECASE)
+    return text
+
+
+def legacy_pdf(text):
+    """The key-point regex the PDF renderer used to run."""
+    return re.sub(r'(\>)([^<:]+)(:)', r'\1<span style="color: #CC9A4E; font-weight: 600;">\2</span>\3', text)
+
+
+def best_of(repeat, fn, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--copies", type=int, default=50, help="times the notes are repeated")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per variant (best is reported)")
+    parser.add_argument("--terms", type=int, default=0, help="extra synthetic dictionary terms")
+    args = parser.parse_args()
+
+    files = args.files or sorted(Path("My_Study_Notes").glob("*/Unit_*.md"))
+    if not files:
+        parser.error("no markdown files found; pass some explicitly")
+    markdown = "\n\n".join(md_log.read_text(path) for path in files) * args.copies
+    html = markdown2.markdown(markdown, extras=["fenced-code-blocks", "tables"])
+
+    terms = LEGACY_TERMS + [f"Synthetic Term {i}" for i in range(args.terms)]
+    matcher = styling.TermMatcher(terms)
+    LEGACY_TERMS[:] = terms
+
+    print(f"{len(markdown) / 1024:.0f} KB markdown, {len(html) / 1024:.0f} KB HTML, {len(matcher)} terms")
+    rows = [
+        ("preview", best_of(args.repeat, legacy_preview, html),
+         best_of(args.repeat, styling.style_html, html, matcher)),
+        ("pdf", best_of(args.repeat, legacy_pdf, html),
+         best_of(args.repeat, styling.style_key_points, html)),
+    ]
+    print(f"{'stage':<10}{'regex chain':>14}{'tree':>12}{'speedup':>10}")
+    for name, old, new in rows:
+        print(f"{name:<10}{old * 1000:>12.1f}ms{new * 1000:>10.1f}ms{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Persistent catalog of subjects and units.
+
+Reruns read subjects and units from a small SQLite database instead of
+probing the filesystem. Each listing costs one stat() of the directory it
+covers: the directory is only rescanned when its mtime no longer matches the
+stored one. The app updates rows directly after every change it makes,
+including files it rewrites in place. Looking up a single unit also checks
+the size and mtime of that unit's files, so a rewrite by another tool shows
+up there.
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from pypdf import PdfReader
+
+import unit_store
+
+UNIT_ENTRY_RE = re.compile(r"^Unit_(\d+)\.(pdf|md|segments)$")
+
+# Bump when SCHEMA changes; an older catalog is dropped and rebuilt from disk
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subjects (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS units (
+    subject TEXT NOT NULL,
+    unit INTEGER NOT NULL,
+    pdf_bytes INTEGER NOT NULL,
+    md_bytes INTEGER NOT NULL,
+    pages INTEGER,
+    segments INTEGER NOT NULL,
+    has_backup INTEGER NOT NULL,
+    files TEXT NOT NULL,  -- unit_files_stamp() when the row was read
+    PRIMARY KEY (subject, unit)
+);
+"""
+
+UNIT_COLUMNS = ("subject", "unit", "pdf_bytes", "md_bytes", "pages", "segments", "has_backup")
+
+
+class Catalog:
+    def __init__(self, root_dir, db_path):
+        """
+        root_dir: the notes root (My_Study_Notes)
+        db_path: SQLite file holding the catalog
+        """
+        self.root_dir = Path(root_dir)
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS subjects; DROP TABLE IF EXISTS units;"
+            )
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.executescript(SCHEMA)
+
+    # -------------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------------
+    def subjects(self):
+        """Sorted subject names."""
+        with self._lock:
+            if self._is_stale(self.root_dir):
+                self._rescan_subjects()
+            rows = self._db.execute("SELECT name FROM subjects ORDER BY name").fetchall()
+        return [name for (name,) in rows]
+
+    def units(self, subject):
+        """Catalog rows (dicts) for every unit of a subject, ordered by unit number."""
+        with self._lock:
+            if self._is_stale(self.root_dir / subject):
+                self._rescan_subject(subject)
+            rows = self._db.execute(
+                f"SELECT {', '.join(UNIT_COLUMNS)} FROM units WHERE subject = ? ORDER BY unit",
+                (subject,),
+            ).fetchall()
+        return [dict(zip(UNIT_COLUMNS, row)) for row in rows]
+
+    def unit(self, subject, unit):
+        """Catalog row for one unit, or None; re-read if its files changed in place."""
+        unit = int(unit)
+        query = f"SELECT {', '.join(UNIT_COLUMNS)}, files FROM units WHERE subject = ? AND unit = ?"
+        with self._lock:
+            if self._is_stale(self.root_dir / subject):
+                self._rescan_subject(subject)
+            row = self._db.execute(query, (subject, unit)).fetchone()
+            if row is not None and row[-1] != unit_files_stamp(self.root_dir / subject, unit):
+                with self._db:
+                    self._write_unit(subject, unit)
+                row = self._db.execute(query, (subject, unit)).fetchone()
+        return None if row is None else dict(zip(UNIT_COLUMNS, row))
+
+    # -------------------------------------------------------------------------
+    # Updates from the app
+    # -------------------------------------------------------------------------
+    def add_subject(self, name):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO subjects (name) VALUES (?)", (name,))
+            self._stamp(self.root_dir)
+            self._stamp(self.root_dir / name)
+
+    def remove_subject(self, name):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM subjects WHERE name = ?", (name,))
+            self._db.execute("DELETE FROM units WHERE subject = ?", (name,))
+            self._db.execute("DELETE FROM dirs WHERE path = ?", (str(self.root_dir / name),))
+            self._stamp(self.root_dir)
+
+    def rename_subject(self, old_name, new_name):
+        with self._lock, self._db:
+            self._db.execute("UPDATE subjects SET name = ? WHERE name = ?", (new_name, old_name))
+            self._db.execute("UPDATE units SET subject = ? WHERE subject = ?", (new_name, old_name))
+            self._db.execute(
+                "UPDATE dirs SET path = ? WHERE path = ?",
+                (str(self.root_dir / new_name), str(self.root_dir / old_name)),
+            )
+            self._stamp(self.root_dir)
+
+    def refresh_unit(self, subject, unit):
+        """Re-read one unit from disk (drops the row if the unit is gone)."""
+        with self._lock, self._db:
+            self._write_unit(subject, int(unit))
+            self._stamp(self.root_dir / subject)
+
+    # -------------------------------------------------------------------------
+    # Scanning
+    # -------------------------------------------------------------------------
+    def _is_stale(self, path):
+        row = self._db.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (str(path),)).fetchone()
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        return row is None or row[0] != mtime_ns
+
+    def _stamp(self, path):
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)", (str(path), mtime_ns)
+        )
+
+    def _rescan_subjects(self):
+        self.root_dir.mkdir(exist_ok=True)
+        names = {d.name for d in self.root_dir.iterdir() if d.is_dir() and not d.name.startswith(".")}
+        with self._db:
+            known = {name for (name,) in self._db.execute("SELECT name FROM subjects")}
+            for name in known - names:
+                self._db.execute("DELETE FROM subjects WHERE name = ?", (name,))
+                self._db.execute("DELETE FROM units WHERE subject = ?", (name,))
+            self._db.executemany("INSERT OR IGNORE INTO subjects (name) VALUES (?)", [(n,) for n in names - known])
+            self._stamp(self.root_dir)
+
+    def _rescan_subject(self, subject):
+        subject_path = self.root_dir / subject
+        found = set()
+        if subject_path.is_dir():
+            for entry in subject_path.iterdir():
+                match = UNIT_ENTRY_RE.match(entry.name)
+                if match:
+                    found.add(int(match.group(1)))
+        with self._db:
+            self._db.execute("DELETE FROM units WHERE subject = ?", (subject,))
+            for unit in sorted(found):
+                self._write_unit(subject, unit)
+            self._stamp(subject_path)
+
+    def _write_unit(self, subject, unit):
+        # Stamped before reading, so a write racing the scan shows up next time
+        files = unit_files_stamp(self.root_dir / subject, unit)
+        row = scan_unit(self.root_dir / subject, unit)
+        self._db.execute("DELETE FROM units WHERE subject = ? AND unit = ?", (subject, unit))
+        if row is not None:
+            columns = (*UNIT_COLUMNS, "files")
+            self._db.execute(
+                f"INSERT INTO units ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                (subject, unit, row["pdf_bytes"], row["md_bytes"], row["pages"], row["segments"], row["has_backup"],
+                 files),
+            )
+
+
+def unit_files_stamp(subject_path, unit):
+    """Size and mtime of every file a unit's row is read from ("-" for a missing one)."""
+    subject_path = Path(subject_path)
+    paths = [
+        unit_store.unit_pdf_path(subject_path, unit),
+        subject_path / f"Unit_{unit}.md",
+        unit_store.segments_dir(subject_path, unit) / unit_store.MANIFEST_NAME,
+        subject_path / f"Unit_{unit}.pdf.bak",
+    ]
+    stamps = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stamps.append("-")
+        else:
+            stamps.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return " ".join(stamps)
+
+
+def scan_unit(subject_path, unit):
+    """Read one unit's stats from disk. Returns None when the unit has neither PDF nor markdown."""
+    pdf_path = unit_store.unit_pdf_path(subject_path, unit)
+    md_path = Path(subject_path) / f"Unit_{unit}.md"
+    row = {
+        "pdf_bytes": 0,
+        "md_bytes": md_path.stat().st_size if md_path.exists() else 0,
+        "pages": 0,
+        "segments": 0,
+        "has_backup": 0,
+    }
+
+    manifest = unit_store.load_manifest(subject_path, unit)
+    if manifest is not None:
+        segments = manifest["segments"]
+        row["pdf_bytes"] = sum(seg["bytes"] for seg in segments)
+        row["pages"] = sum(seg["pages"] for seg in segments)
+        row["segments"] = len(segments)
+        row["has_backup"] = int(manifest["previous"] is not None)
+    elif pdf_path.exists():
+        row["pdf_bytes"] = pdf_path.stat().st_size
+        try:
+            row["pages"] = len(PdfReader(pdf_path).pages)
+        except Exception:
+            row["pages"] = None
+        row["has_backup"] = int((Path(subject_path) / f"Unit_{unit}.pdf.bak").exists())
+
+    if not (row["pdf_bytes"] or row["md_bytes"] or row["has_backup"]):
+        return None
+    return row
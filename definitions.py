@@ -0,0 +1,381 @@
+"""
+Server-side lookups for select-to-define.
+
+The preview component sends the selected term to Python instead of calling
+the LLM from the browser. Definitions are cached in SQLite by normalized term
+and subject, concurrent lookups of the same term share one request (run in
+the background, so callers get a Future and never wait on the network), and
+a token bucket keeps the app under its API quota.
+
+After a unit is consolidated, a background job collects its likely terms
+(terminology list matches, bold key points, headings) and defines them a
+batch at a time, so most selections are answered from the cache without a
+network call. The terms found in each unit are kept as its glossary.
+
+The endpoint speaks the Gemini generateContent format, so a local stand-in
+server (see tools/llm_stub_server.py) can take its place.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS definitions (
+    term TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (term, subject)
+);
+CREATE TABLE IF NOT EXISTS glossary (
+    subject TEXT NOT NULL,
+    unit INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    display TEXT NOT NULL,
+    PRIMARY KEY (subject, unit, term)
+);
+"""
+
+EDGE_PUNCTUATION_RE = re.compile(r"^[\W_]+|[\W_]+$")
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Glossary candidates in a unit's markdown
+HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+BOLD_RE = re.compile(r"\*\*([^*\n]+?)\*\*|__([^_\n]+?)__")
+INLINE_MARKUP_RE = re.compile(r"[*_`]|\[|\]\([^)]*\)")
+LEADING_NUMBER_RE = re.compile(
+    r"^(?:(?:unit|chapter|part|section|module)\s+\w+\s*[:.-]|\d+(?:\.\d+)*[.)]?|[IVX]+\.)\s+", re.IGNORECASE
+)
+TERM_RE = re.compile(r"^[^\W\d_][\w'()/.+& -]*$")
+CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+GLOSSARY_MAX_WORDS = 5
+# Section labels rather than terms
+GENERIC_LABELS = {
+    "analogy", "definition", "example", "examples", "explanation", "important", "introduction",
+    "key points", "mechanism", "note", "notes", "overview", "real-world analogy", "summary", "tip",
+}
+
+
+def glossary_terms(markdown_text, matcher=None, limit=300):
+    """
+    Terms worth defining ahead of time, in order of appearance.
+
+    Takes dictionary terms found by matcher (a styling.TermMatcher), bold key
+    points ("**Phishing:** ...") and short headings. Dates, sentences and
+    other text that does not look like a term are left out.
+    """
+    candidates = [(m.start(), m.group(1)) for m in HEADING_RE.finditer(markdown_text)]
+    candidates += [(m.start(), m.group(1) or m.group(2)) for m in BOLD_RE.finditer(markdown_text)]
+    if matcher is not None:
+        candidates += [(start, markdown_text[start:end]) for start, end in matcher.find(markdown_text)]
+
+    terms = {}
+    for _, raw in sorted(candidates, key=lambda c: c[0]):
+        term = clean_term(raw)
+        if term and normalize_term(term) not in terms:
+            terms[normalize_term(term)] = term
+            if len(terms) >= limit:
+                break
+    return list(terms.values())
+
+
+def clean_term(text):
+    """A heading or bold span reduced to a term, or None if it does not look like one."""
+    text = INLINE_MARKUP_RE.sub("", text)
+    text = LEADING_NUMBER_RE.sub("", WHITESPACE_RE.sub(" ", text).strip())
+    text = text.rstrip(" :-").strip()
+    if not TERM_RE.match(text) or len(text.split()) > GLOSSARY_MAX_WORDS or len(text) > 60:
+        return None
+    if normalize_term(text) in GENERIC_LABELS:
+        return None
+    return text
+
+
+class DefinitionError(RuntimeError):
+    """A definition could not be fetched; the message is safe to show."""
+
+
+def normalize_term(term):
+    """Cache key for a selection: lowercase, single spaces, no surrounding punctuation."""
+    return EDGE_PUNCTUATION_RE.sub("", WHITESPACE_RE.sub(" ", term.strip())).lower()
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests per `per` seconds, with bursts up to `rate`."""
+
+    def __init__(self, rate, per=60.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self, timeout):
+        """Wait up to timeout seconds for a token."""
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(min(self.per / self.rate, max(0.0, deadline - time.monotonic())))
+        return True
+
+
+class DefinitionService:
+    def __init__(self, db_path, api_key="", endpoint=GEMINI_ENDPOINT, rate_per_minute=30, timeout=15,
+                 batch_size=40):
+        """
+        db_path: SQLite file holding cached definitions
+        api_key: sent as x-goog-api-key (may be empty for a local stand-in)
+        endpoint: generateContent URL
+        rate_per_minute: remote lookups allowed per minute across all sessions
+        timeout: seconds to wait for the endpoint
+        batch_size: terms defined per request by the glossary job
+        """
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate_per_minute)
+        self.remote_calls = 0
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._inflight_lock = threading.Lock()
+        self._inflight = {}  # (term, subject) -> Future
+        self._lookups = ThreadPoolExecutor(max_workers=4, thread_name_prefix="define")
+        self._session = requests.Session()
+        # One glossary job at a time, so it never competes with itself for the quota
+        self._glossary_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="glossary")
+        self._glossary_jobs = {}  # (subject, unit) -> Future
+        self._glossary_lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    # Cache
+    # -------------------------------------------------------------------------
+    def cached(self, term, subject=""):
+        """Cached definition or None."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT definition FROM definitions WHERE term = ? AND subject = ?",
+                (normalize_term(term), subject or ""),
+            ).fetchone()
+        return row[0] if row else None
+
+    def store(self, term, subject, definition, source="remote"):
+        self.store_many([(term, definition)], subject, source)
+
+    def store_many(self, definitions, subject, source="remote"):
+        """Cache (term, definition) pairs in one transaction."""
+        now = time.time()
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO definitions (term, subject, definition, source, created) VALUES (?, ?, ?, ?, ?)",
+                [(normalize_term(term), subject or "", definition, source, now) for term, definition in definitions],
+            )
+
+    def _uncached(self, terms, subject):
+        keys = {normalize_term(term): term for term in terms}
+        with self._db_lock:
+            known = {
+                row[0] for row in self._db.execute(
+                    "SELECT term FROM definitions WHERE subject = ?", (subject or "",)
+                )
+            }
+        return [term for key, term in keys.items() if key and key not in known]
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+    def lookup(self, term, subject="", offline=None):
+        """
+        Future for the definition of term in the context of subject.
+
+        Offline and cached answers come back already resolved. Otherwise one
+        remote request per term runs in the background and everyone asking
+        for the term meanwhile gets the same Future.
+        offline: glossary.OfflineGlossary consulted before the network; exact
+        entries win over the cache, typo matches only over a remote call.
+        The Future raises DefinitionError when the term cannot be fetched.
+        """
+        key = (normalize_term(term), subject or "")
+        future = Future()
+        if not key[0]:
+            future.set_exception(DefinitionError("Select a word or phrase to define"))
+            return future
+        entry = offline.lookup(term, fuzzy=False) if offline is not None else None
+        definition = entry[1] if entry is not None else self.cached(*key)
+        if definition is None:
+            entry = offline.lookup(term) if offline is not None else None
+            definition = entry[1] if entry is not None else None
+        if definition is not None:
+            future.set_result(definition)
+            return future
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = self._lookups.submit(self._fetch_and_store, term, key)
+            return future
+
+    def define(self, term, subject="", offline=None):
+        """Definition of term, waiting for a remote lookup. Raises DefinitionError."""
+        return self.lookup(term, subject, offline).result(timeout=self.timeout + 5)
+
+    def _fetch_and_store(self, term, key):
+        try:
+            # A lookup that just finished may have stored it already
+            definition = self.cached(*key)
+            if definition is None:
+                definition = self._fetch(EDGE_PUNCTUATION_RE.sub("", term.strip()), key[1])
+                self.store(key[0], key[1], definition)
+            return definition
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _fetch(self, term, subject):
+        if not self.limiter.try_acquire():
+            raise DefinitionError("Too many lookups right now. Try again in a minute.")
+        context = f" (in {subject.replace('_', ' ')})" if subject else ""
+        return self._generate(f"Define briefly in 1-2 simple sentences for a student{context}: {term}", 120)
+
+    def _generate(self, prompt, max_tokens, timeout=None):
+        """Text of one generateContent reply. Raises DefinitionError."""
+        body = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.3, "maxOutputTokens": max_tokens},
+        }
+        headers = {"x-goog-api-key": self.api_key} if self.api_key else {}
+        self.remote_calls += 1
+        try:
+            res = self._session.post(self.endpoint, json=body, headers=headers, timeout=timeout or self.timeout)
+        except requests.RequestException:
+            raise DefinitionError("Definition service unreachable. Try again later.")
+        if res.status_code == 429:
+            raise DefinitionError("Limit reached. Try again tomorrow.")
+        if not res.ok:
+            raise DefinitionError("Definition service unavailable.")
+        try:
+            text = res.json()["candidates"][0]["content"]["parts"][0]["text"].strip()
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise DefinitionError("No definition available")
+        if not text:
+            raise DefinitionError("No definition available")
+        return text
+
+    # -------------------------------------------------------------------------
+    # Unit glossaries
+    # -------------------------------------------------------------------------
+    def schedule_glossary(self, subject, unit, markdown_text, matcher=None, offline=None):
+        """
+        Define a unit's terms in the background (see build_glossary).
+
+        A unit already queued is not queued again. Returns the job's Future.
+        """
+        key = (subject, unit)
+        with self._glossary_lock:
+            job = self._glossary_jobs.get(key)
+            if job is not None and not job.done():
+                return job
+            job = self._glossary_runner.submit(self._run_glossary, subject, unit, markdown_text, matcher, offline)
+            self._glossary_jobs[key] = job
+            return job
+
+    def _run_glossary(self, subject, unit, markdown_text, matcher, offline):
+        try:
+            return self.build_glossary(subject, unit, markdown_text, matcher, offline)
+        except DefinitionError:
+            return 0  # whatever is missing is looked up on selection instead
+
+    def build_glossary(self, subject, unit, markdown_text, matcher=None, offline=None):
+        """
+        Record the unit's glossary and define its uncached terms in batches.
+
+        Terms the offline glossary already defines are not sent.
+        Each batch is one request; the job waits for the rate limiter rather
+        than failing. Returns the number of terms defined.
+        """
+        terms = glossary_terms(markdown_text, matcher)
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM glossary WHERE subject = ? AND unit = ?", (subject, unit))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO glossary (subject, unit, term, display) VALUES (?, ?, ?, ?)",
+                [(subject, unit, normalize_term(term), term) for term in terms],
+            )
+
+        missing = [term for term in self._uncached(terms, subject) if offline is None or term not in offline]
+        defined = 0
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            if not self.limiter.acquire(timeout=self.limiter.per):
+                raise DefinitionError("Too many lookups right now. Try again in a minute.")
+            answers = self._fetch_batch(batch, subject)
+            self.store_many(answers, subject, source="glossary")
+            defined += len(answers)
+        return defined
+
+    def _fetch_batch(self, terms, subject):
+        """Define several terms in one request; returns (term, definition) pairs."""
+        context = f" studying {subject.replace('_', ' ')}" if subject else ""
+        prompt = (
+            f"Define each term below briefly, in 1-2 simple sentences, for a student{context}. "
+            "Reply with only a JSON object mapping each term, exactly as written, to its definition.\n\n"
+            + "\n".join(f"- {term}" for term in terms)
+        )
+        text = self._generate(prompt, max_tokens=80 * len(terms), timeout=self.timeout * 4)
+        try:
+            answers = json.loads(CODE_FENCE_RE.sub("", text))
+        except ValueError:
+            raise DefinitionError("Glossary reply was not JSON")
+        if not isinstance(answers, dict):
+            raise DefinitionError("Glossary reply was not a JSON object")
+        wanted = {normalize_term(term): term for term in terms}
+        return [
+            (wanted[normalize_term(term)], definition.strip())
+            for term, definition in answers.items()
+            if isinstance(term, str) and isinstance(definition, str) and definition.strip()
+            and normalize_term(term) in wanted
+        ]
+
+    def glossary(self, subject, unit):
+        """A unit's glossary as (term, definition or None) pairs, alphabetically."""
+        with self._db_lock:
+            return self._db.execute(
+                """
+                SELECT g.display, d.definition FROM glossary g
+                LEFT JOIN definitions d ON d.term = g.term AND d.subject = g.subject
+                WHERE g.subject = ? AND g.unit = ?
+                ORDER BY g.term
+                """,
+                (subject, unit),
+            ).fetchall()
+
+    def stats(self):
+        with self._db_lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM definitions").fetchone()
+            (glossary,) = self._db.execute(
+                "SELECT COUNT(*) FROM definitions WHERE source = 'glossary'"
+            ).fetchone()
+        return {"cached": count, "glossary": glossary, "remote_calls": self.remote_calls}
@@ -0,0 +1,134 @@
+"""
+Small on-disk byte cache with size-bounded LRU eviction.
+
+Each entry is one file named after its key. Recency is tracked with the file
+mtime, so the LRU order survives app restarts.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class DiskCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, suffix=".bin"):
+        """
+        directory: folder holding the cache entries (created if missing)
+        max_bytes: total size budget; least recently used entries are evicted past it
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the given parts into a stable hex key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = str(part).encode("utf-8")
+            # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}{self.suffix}"
+
+    def _load(self):
+        """Rebuild the in-memory index from the files already on disk."""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                data = self._path(key).read_bytes()
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                # Removed behind our back
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Store bytes under key and evict old entries beyond the budget."""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        with self._lock:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def discard(self, key):
+        """Drop a single entry if present."""
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+                self._path(key).unlink(missing_ok=True)
+
+    def discard_prefix(self, prefix):
+        """Drop every entry whose key starts with prefix."""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._total_bytes -= self._entries.pop(key)
+                self._path(key).unlink(missing_ok=True)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            for key in self._entries:
+                self._path(key).unlink(missing_ok=True)
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self):
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,59 +1,403 @@
 import os
 import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 import streamlit as st
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CONFLICT_STATUSES = {409, 422}  # our remote SHA is stale (or missing)
+HASH_CHUNK_BYTES = 1024 * 1024
+BLOB_SHA_MEMO_ENTRIES = 4096  # file versions whose SHA is remembered, least recently used dropped first
+
+_blob_sha_memo = OrderedDict()
+_blob_sha_lock = threading.Lock()
+
+def git_blob_sha(file_path):
+    """
+    The SHA git (and GitHub) gives a file's content, read in chunks.
+
+    Memoised by (path, size, mtime), so re-checking an unchanged file is free;
+    only the most recently used BLOB_SHA_MEMO_ENTRIES versions are kept.
+    """
+    file_path = Path(file_path)
+    stat = file_path.stat()
+    memo_key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _blob_sha_lock:
+        if memo_key in _blob_sha_memo:
+            _blob_sha_memo.move_to_end(memo_key)
+            return _blob_sha_memo[memo_key]
+    digest = hashlib.sha1(f"blob {stat.st_size}\0".encode())
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    sha = digest.hexdigest()
+    with _blob_sha_lock:
+        _blob_sha_memo[memo_key] = sha
+        while len(_blob_sha_memo) > BLOB_SHA_MEMO_ENTRIES:
+            _blob_sha_memo.popitem(last=False)
+    return sha
+
+class ShaCache:
+    """Persistent map of repository path -> last known remote blob SHA."""
+
+    def __init__(self, path=None):
+        """path: JSON file to keep the map in; None keeps it in memory only"""
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._shas = {}
+        if self.path and self.path.exists():
+            try:
+                self._shas = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                self._shas = {}  # corrupt; every path is looked up again
+
+    def get(self, rel_path):
+        with self._lock:
+            return self._shas.get(rel_path)
+
+    def set(self, rel_path, sha):
+        self.set_many([(rel_path, sha)])
+
+    def set_many(self, items):
+        """Record several (rel_path, sha) pairs (None forgets a path), saving the file once."""
+        with self._lock:
+            changed = False
+            for rel_path, sha in items:
+                if sha is None:
+                    changed |= self._shas.pop(rel_path, None) is not None
+                elif self._shas.get(rel_path) != sha:
+                    self._shas[rel_path] = sha
+                    changed = True
+            if changed:
+                self._save()
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(self._shas, indent=0, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
 class GithubSync:
-    def __init__(self, token, repo_name, branch='main'):
+    def __init__(self, token, repo_name, branch='main', max_retries=4, backoff=1.0, max_wait=60, timeout=30,
+                 pool_size=8, sha_cache_dir=None):
         """
         token: GitHub Personal Access Token
         repo_name: 'username/repository'
+        max_retries: retries for connection errors, 5xx and rate limiting
+        backoff: first retry delay in seconds, doubled on each retry
+        max_wait: longest single wait; a longer Retry-After or rate limit reset gives up instead
+        timeout: seconds per request
+        pool_size: kept-alive connections to api.github.com
+        sha_cache_dir: folder keeping the remote blob SHAs of pushed files between runs
         """
         self.token = token
         self.repo = repo_name
         self.branch = branch
         self.base_url = f"https://api.github.com/repos/{repo_name}"
         self.headers = {"Authorization": f"token {token}"}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.timeout = timeout
+        cache_name = f"{repo_name.replace('/', '__')}@{branch}.json"
+        self.shas = ShaCache(Path(sha_cache_dir) / cache_name if sha_cache_dir else None)
+        self._tree_etags = {}  # pull prefix -> ETag of the tree listing it last processed
+        # One pooled keep-alive session for every call made through this instance
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _request(self, method, url, **kwargs):
+        """
+        Send a request, retrying transient failures with exponential backoff.
+
+        Retry-After and the x-ratelimit-* headers decide the wait when GitHub
+        sends them. Returns the last response; raises the last connection error.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            wait = self._retry_wait(resp, attempt)
+            if wait is None or attempt == self.max_retries or wait > self.max_wait:
+                return resp
+            time.sleep(wait)
+        return resp
+
+    def _backoff(self, attempt):
+        # Full jitter so parallel syncs don't retry in lockstep
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _retry_wait(self, resp, attempt):
+        """Seconds to wait before retrying resp, or None if it should not be retried."""
+        rate_limited = resp.status_code == 429 or (
+            resp.status_code == 403
+            and ("Retry-After" in resp.headers or resp.headers.get("x-ratelimit-remaining") == "0")
+        )
+        if resp.status_code not in RETRY_STATUSES and not rate_limited:
+            return None
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        if resp.headers.get("x-ratelimit-remaining") == "0":
+            try:
+                return max(0.0, int(resp.headers["x-ratelimit-reset"]) - time.time()) + 1
+            except (KeyError, ValueError):
+                pass
+        return self._backoff(attempt)
+
+    @staticmethod
+    def repo_path(file_path):
+        """Path of a local file in the repository (relative to the app root, i.e. CWD)."""
+        try:
+            return Path(file_path).resolve().relative_to(Path.cwd().resolve()).as_posix()
+        except ValueError:
+            return Path(file_path).name # Outside the app root
+
+    def _remote_sha(self, url, rel_path):
+        """Ask GitHub for the current blob SHA of a path (None if it does not exist) and remember it."""
+        resp = self._request("GET", url, params={"ref": self.branch})
+        sha = resp.json()["sha"] if resp.status_code == 200 else None
+        self.shas.set(rel_path, sha)
+        return sha
 
     def push_file(self, file_path, commit_message):
         """Push a single file to GitHub"""
         file_path = Path(file_path)
         try:
-            with open(file_path, "rb") as f:
-                content = base64.b64encode(f.read()).decode()
+            rel_path = self.repo_path(file_path)
+            url = f"{self.base_url}/contents/{rel_path}"
 
-            # Get relative path from root (assumed to be app root)
-            # If absolute, make relative to CWD
-            try:
-                rel_path = file_path.relative_to(os.getcwd())
-            except ValueError:
-                rel_path = file_path.name # Fallback
+            # The SHA is needed to update an existing file; the cached one saves a GET
+            sha = self.shas.get(rel_path)
+            if sha is None:
+                sha = self._remote_sha(url, rel_path)
+            if sha == git_blob_sha(file_path):
+                return True, "Already up to date"
 
-            # Check if file exists to get SHA (for update)
-            url = f"{self.base_url}/contents/{rel_path}"
-            get_resp = requests.get(url, headers=self.headers)
-            
+            with open(file_path, "rb") as f:
+                content = base64.b64encode(f.read()).decode()
             payload = {
                 "message": commit_message,
                 "content": content,
                 "branch": self.branch
             }
+            if sha:
+                payload["sha"] = sha
+
+            resp = self._request("PUT", url, json=payload)
+            if resp.status_code in CONFLICT_STATUSES:
+                # Changed remotely since we last saw it: refetch the SHA and try once more
+                payload.pop("sha", None)
+                sha = self._remote_sha(url, rel_path)
+                if sha:
+                    payload["sha"] = sha
+                resp = self._request("PUT", url, json=payload)
 
-            if get_resp.status_code == 200:
-                payload["sha"] = get_resp.json()["sha"]
-            
-            resp = requests.put(url, json=payload, headers=self.headers)
             if resp.status_code in [200, 201]:
+                self.shas.set(rel_path, resp.json()["content"]["sha"])
                 return True, "Synced to Cloud"
             else:
+                self.shas.set(rel_path, None)
                 return False, f"Sync Error: {resp.json().get('message')}"
         except Exception as e:
             return False, str(e)
 
+    def push_files(self, file_paths, commit_message, max_workers=4):
+        """
+        Push several files to GitHub as one commit (Git Data API).
+
+        Files whose content already matches the remote blob are left out.
+        Blobs are uploaded in parallel (max_workers at a time), then one tree,
+        one commit and a ref update publish them together; if the branch
+        moved meanwhile the commit is rebuilt on the new head once.
+        """
+        try:
+            changed = {}  # repo path -> local path
+            for file_path in file_paths:
+                if file_path is None or not Path(file_path).exists():
+                    continue
+                rel_path = self.repo_path(file_path)
+                if self.shas.get(rel_path) != git_blob_sha(file_path):
+                    changed[rel_path] = Path(file_path)
+            if not changed:
+                return True, "Already up to date"
+
+            ref_url = f"{self.base_url}/git/refs/heads/{self.branch}"
+            head = self._request("GET", ref_url)
+            if head.status_code != 200:
+                # Empty repository or missing branch: the Contents API creates it
+                first, *rest = changed.values()
+                ok, msg = self.push_file(first, commit_message)
+                if not ok or not rest:
+                    return ok, msg
+                return self.push_files(rest, commit_message, max_workers)
+
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="github-blob") as pool:
+                blob_shas = dict(zip(changed, pool.map(self._create_blob, changed.values())))
+
+            for attempt in range(2):
+                head_sha = head.json()["object"]["sha"]
+                base_commit = self._request("GET", f"{self.base_url}/git/commits/{head_sha}")
+                self._raise_for_status(base_commit)
+                tree = self._request("POST", f"{self.base_url}/git/trees", json={
+                    "base_tree": base_commit.json()["tree"]["sha"],
+                    "tree": [
+                        {"path": rel_path, "mode": "100644", "type": "blob", "sha": sha}
+                        for rel_path, sha in blob_shas.items()
+                    ],
+                })
+                self._raise_for_status(tree)
+                commit = self._request("POST", f"{self.base_url}/git/commits", json={
+                    "message": commit_message, "tree": tree.json()["sha"], "parents": [head_sha],
+                })
+                self._raise_for_status(commit)
+                update = self._request("PATCH", ref_url, json={"sha": commit.json()["sha"]})
+                if update.status_code == 200:
+                    break
+                if update.status_code != 422 or attempt:
+                    self._raise_for_status(update)
+                # Not a fast-forward: someone pushed in between, rebuild on their commit
+                head = self._request("GET", ref_url)
+                self._raise_for_status(head)
+
+            self.shas.set_many(blob_shas.items())
+            return True, f"Synced {len(blob_shas)} file{'s' if len(blob_shas) != 1 else ''} to Cloud"
+        except requests.RequestException:
+            return False, "GitHub is unreachable"
+        except Exception as e:
+            return False, str(e)
+
+    def _create_blob(self, file_path):
+        with open(file_path, "rb") as f:
+            content = base64.b64encode(f.read()).decode()
+        resp = self._request("POST", f"{self.base_url}/git/blobs", json={"content": content, "encoding": "base64"})
+        self._raise_for_status(resp)
+        return resp.json()["sha"]
+
+    @staticmethod
+    def _raise_for_status(resp):
+        if resp.status_code >= 400:
+            try:
+                message = resp.json().get("message")
+            except ValueError:
+                message = resp.reason
+            raise RuntimeError(f"Sync Error: {message}")
+
+    def pull(self, prefix="", max_workers=8, write=None):
+        """
+        Download files under prefix that changed on GitHub (paths relative to CWD).
+
+        The whole tree is listed in one conditional request, so an unchanged
+        branch costs a 304. Only blobs whose SHA differs from the local file
+        are fetched, in parallel (max_workers at a time), and each is written
+        atomically. A local file edited since it was last synced is kept; the
+        outbox pushes it instead.
+
+        write: called as write(path, data) from the download threads to store
+        each file, for callers that keep derived state next to it (default:
+        atomic replace)
+        """
+        write = write or self.write_file
+        prefix = prefix.strip("/")
+        try:
+            headers = {}
+            if prefix in self._tree_etags:
+                headers["If-None-Match"] = self._tree_etags[prefix]
+            resp = self._request(
+                "GET", f"{self.base_url}/git/trees/{self.branch}", params={"recursive": "1"}, headers=headers
+            )
+            if resp.status_code == 304:
+                return True, "Already up to date"
+            if resp.status_code in (404, 409):
+                return True, "Nothing to pull yet"  # missing branch or empty repository
+            self._raise_for_status(resp)
+            listing = resp.json()
+            if listing.get("truncated"):
+                return False, "Repository is too large to list in one request"
+
+            wanted, kept = [], 0
+            synced = {}  # repo path -> SHA now the same here and on GitHub, saved once below
+            try:
+                for entry in listing["tree"]:
+                    path = entry["path"]
+                    if entry["type"] != "blob" or (prefix and path != prefix and not path.startswith(prefix + "/")):
+                        continue
+                    local_path = Path(path)
+                    if not local_path.exists():
+                        wanted.append(entry)
+                        continue
+                    local_sha = git_blob_sha(local_path)
+                    if local_sha == entry["sha"]:
+                        synced[path] = local_sha
+                    elif local_sha == self.shas.get(path):
+                        wanted.append(entry)  # unchanged here since the last sync, changed remotely
+                    else:
+                        kept += 1
+
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="github-pull") as pool:
+                    for entry in pool.map(lambda entry: self._download_blob(entry, write), wanted):
+                        synced[entry["path"]] = entry["sha"]
+            finally:
+                # Files written before a failure are recorded too
+                self.shas.set_many(synced.items())
+
+            if "ETag" in resp.headers:
+                self._tree_etags[prefix] = resp.headers["ETag"]
+            msg = f"Pulled {len(wanted)} file{'s' if len(wanted) != 1 else ''}" if wanted else "Already up to date"
+            if kept:
+                msg += f" (kept {kept} local change{'s' if kept != 1 else ''})"
+            return True, msg
+        except requests.RequestException:
+            return False, "GitHub is unreachable"
+        except Exception as e:
+            return False, str(e)
+
+    def _download_blob(self, entry, write):
+        resp = self._request(
+            "GET", f"{self.base_url}/git/blobs/{entry['sha']}",
+            headers={"Accept": "application/vnd.github.raw+json"},
+        )
+        self._raise_for_status(resp)
+        if resp.headers.get("Content-Type", "").startswith("application/json"):
+            data = base64.b64decode(resp.json()["content"])
+        else:
+            data = resp.content
+        if hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest() != entry["sha"]:
+            raise RuntimeError(f"Sync Error: {entry['path']} arrived damaged")
+        write(Path(entry["path"]), data)
+        return entry
+
+    @staticmethod
+    def write_file(path, data):
+        """Atomically replace the file at path with data."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
     def pull_file(self, file_path):
         """Pull a single file from GitHub"""
-        # ... logic for pulling if needed ...
-        # For this app, we mainly worry about Pushing new notes.
-        # Full sync is complex.
-        pass
+        return self.pull(self.repo_path(file_path))
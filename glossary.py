@@ -0,0 +1,173 @@
+"""
+Offline glossary for select-to-define.
+
+Definitions that ship with the app (for the default terminology list) and
+the user's own glossary file are indexed in a character trie built once per
+process. Lookups take microseconds and need no network, so common terms are
+answered even when the LLM is unreachable. Plural selections ("Botnets")
+find the singular entry, and longer words within a typo or two of an entry
+still match.
+"""
+
+import re
+from pathlib import Path
+
+from definitions import normalize_term
+
+# Definitions for styling.DEFAULT_TERMS
+BUILTIN_DEFINITIONS = {
+    "SMTP": "Simple Mail Transfer Protocol, the standard protocol mail servers use to send and relay email.",
+    "Botnet": "A network of malware-infected computers controlled remotely by an attacker, often used for spam or DDoS attacks.",
+    "Malware": "Malicious software designed to damage, disrupt or gain unauthorized access to a computer system.",
+    "Phishing": "A scam where attackers pose as a trusted party, usually by email, to trick people into revealing passwords or other sensitive data.",
+    "Ransomware": "Malware that encrypts a victim's files and demands payment for the key to unlock them.",
+    "Firewall": "A security system that filters network traffic against a set of rules to block unauthorized access.",
+    "VPN": "Virtual Private Network, an encrypted tunnel over the internet that hides traffic from others on the network.",
+    "DNS": "Domain Name System, which translates domain names like example.com into IP addresses.",
+    "HTTP": "Hypertext Transfer Protocol, the protocol web browsers and servers use to exchange pages and data.",
+    "HTTPS": "HTTP sent over an encrypted TLS connection, protecting web traffic from eavesdropping and tampering.",
+    "SSL": "Secure Sockets Layer, the older predecessor of TLS for encrypting network connections.",
+    "TLS": "Transport Layer Security, the protocol that encrypts and authenticates connections such as HTTPS.",
+    "API": "Application Programming Interface, a defined way for programs to request services or data from each other.",
+    "SQL": "Structured Query Language, used to read and change data in relational databases.",
+    "XSS": "Cross-Site Scripting, an attack that injects malicious scripts into web pages viewed by other users.",
+    "DDoS": "Distributed Denial of Service, an attack that floods a target with traffic from many machines to knock it offline.",
+    "DoS": "Denial of Service, an attack that overwhelms a system so legitimate users cannot reach it.",
+    "IP": "Internet Protocol, which addresses and routes packets between devices on a network.",
+    "TCP": "Transmission Control Protocol, which delivers data reliably and in order between two devices.",
+    "UDP": "User Datagram Protocol, a fast connectionless protocol that sends data without delivery guarantees.",
+    "HTML": "HyperText Markup Language, the language used to structure web pages.",
+    "CSS": "Cascading Style Sheets, the language that controls how web pages look.",
+    "Harvesting": "Collecting data such as email addresses or credentials in bulk, often automatically, for spam or attacks.",
+    "Spoofing": "Disguising a message or connection so it appears to come from a trusted source.",
+    "Encryption": "Converting data into an unreadable form that only holders of the right key can turn back.",
+    "Decryption": "Turning encrypted data back into its readable form using the correct key.",
+    "Authentication": "Verifying that a user or system really is who or what it claims to be.",
+    "Authorization": "Deciding what an authenticated user or system is allowed to access or do.",
+    "Trojan": "Malware disguised as legitimate software that gives attackers access once it is run.",
+    "Worm": "Self-replicating malware that spreads across networks without needing to attach to a file.",
+    "Spyware": "Software that secretly gathers information about a user and sends it to someone else.",
+    "Adware": "Software that shows unwanted advertising, sometimes tracking the user to target it.",
+    "Keylogger": "Software or hardware that records keystrokes to capture passwords and other typed information.",
+}
+
+GLOSSARY_LINE_RE = re.compile(r"^\s*([^:#][^:]*?)\s*:\s*(.+?)\s*$")
+# Plural endings, tried longest first: (suffix, replacement)
+PLURAL_SUFFIXES = [("ies", "y"), ("sses", "ss"), ("xes", "x"), ("ches", "ch"), ("shes", "sh"), ("es", "e"), ("s", "")]
+END = ""  # trie key holding the entry stored at a node
+
+
+def singular_forms(key):
+    """Possible singular forms of a normalized term (only its last word changes)."""
+    forms = []
+    for suffix, replacement in PLURAL_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix) + 1 and not key.endswith("ss"):
+            forms.append(key[:-len(suffix)] + replacement)
+    return forms
+
+
+def max_typos(key):
+    """Edits tolerated for a term of this length (none for short acronyms)."""
+    return 0 if len(key) < 5 else 1 if len(key) < 9 else 2
+
+
+def load_glossary_file(path):
+    """(term, definition) pairs from "Term: definition" lines; # comments and blanks are skipped."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        match = GLOSSARY_LINE_RE.match(line)
+        if match:
+            entries.append((match.group(1), match.group(2)))
+    return entries
+
+
+def save_glossary_file(path, text):
+    """Write the glossary from its text form, keeping only valid lines; returns the entry count."""
+    lines = [line.strip() for line in text.splitlines()]
+    kept = [line for line in lines if line.startswith("#") or GLOSSARY_LINE_RE.match(line)]
+    Path(path).write_text("\n".join(kept) + "\n", encoding="utf-8")
+    return sum(1 for line in kept if not line.startswith("#"))
+
+
+class OfflineGlossary:
+    """Term -> definition index with plural and typo tolerant lookups."""
+
+    def __init__(self, entries):
+        """
+        entries: (term, definition) pairs; later entries replace earlier ones
+        for the same term, so user glossaries go after the built-in one.
+        """
+        self._root = {}
+        self._entries = []  # (term, definition), referenced from trie nodes by index
+        self.hits = 0
+        self.misses = 0
+        for term, definition in entries:
+            self.add(term, definition)
+
+    def add(self, term, definition):
+        key = normalize_term(term)
+        if not key or not definition:
+            return
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        if END in node:
+            self._entries[node[END]] = (term, definition)
+        else:
+            node[END] = len(self._entries)
+            self._entries.append((term, definition))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, term):
+        return self._exact(normalize_term(term)) is not None
+
+    def _exact(self, key):
+        for candidate in [key, *singular_forms(key)]:
+            node = self._root
+            for char in candidate:
+                node = node.get(char)
+                if node is None:
+                    break
+            else:
+                if END in node:
+                    return node[END]
+        return None
+
+    def lookup(self, term, fuzzy=True):
+        """(term, definition) of the closest entry, or None. fuzzy=False skips the typo search."""
+        key = normalize_term(term)
+        index = self._exact(key)
+        if index is None and not fuzzy:
+            return None
+        if index is None and max_typos(key):
+            index = self._closest(key, max_typos(key))
+        if index is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._entries[index]
+
+    def _closest(self, key, limit):
+        """Entry within `limit` edits of key (Levenshtein), walking the trie once."""
+        best = (limit + 1, None)
+        first_row = list(range(len(key) + 1))
+        stack = [(child, char, first_row) for char, child in self._root.items() if char != END]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for i, key_char in enumerate(key, 1):
+                row.append(min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (key_char != char)))
+            if END in node and row[-1] < best[0]:
+                best = (row[-1], node[END])
+            # Deeper nodes can only get further away once every cell is over the limit
+            if min(row) < best[0]:
+                stack.extend((child, next_char, row) for next_char, child in node.items() if next_char != END)
+        return best[1]
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,133 @@
+"""
+Shared cache of markdown -> HTML conversions.
+
+Conversions are keyed by the content hash and the markdown2 extras used,
+bounded by the total size of the cached HTML, and kept for the whole process,
+so every session, the editor preview and the PDF pipeline reuse each other's
+work. The PDF converts a note whole; the preview converts it block by block
+(see split_blocks), so editing one part of a long note only re-parses the
+block that changed.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import markdown2
+
+# Used by both the preview and the PDF, so the preview shows what will be printed
+MARKDOWN_EXTRAS = ("fenced-code-blocks", "tables", "strike", "header-ids")
+
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+LIST_ITEM_RE = re.compile(r"^ {0,3}(?:[*+-]|\d+[.)])\s")
+# Raw HTML blocks run to their closing tag, blank lines included (markdown2's block tags)
+HTML_BLOCK_RE = re.compile(
+    r"^<(blockquote|body|dd|del|div|dl|dt|fieldset|form|h[1-6]|head|html|iframe|ins|li|math"
+    r"|noscript|ol|p|pre|script|style|table|tfoot|ul|address|article|aside|canvas|figcaption"
+    r"|figure|footer|header|main|nav|section|video)\b"
+)
+# Reference links and footnotes resolve across blocks, so such notes convert whole
+REFERENCE_DEF_RE = re.compile(r"^ {0,3}\[\^?[^\]]+\]:", re.MULTILINE)
+
+
+def split_blocks(markdown_text):
+    """
+    Split markdown into blocks that render the same on their own as in the
+    whole document.
+
+    Blank lines end a block, except inside fenced code or a raw HTML block,
+    before indented continuation lines, and between the items of a loose
+    list. Notes with reference definitions come back as a single block.
+    """
+    if REFERENCE_DEF_RE.search(markdown_text):
+        return [markdown_text]
+    blocks = []
+    current = []
+    fence = None
+    html_close = None  # closing tag of the raw HTML block being read
+    blank_run = []
+    for line in markdown_text.splitlines():
+        if fence:
+            current.append(line)
+            if line.strip().startswith(fence):
+                fence = None
+            continue
+        if html_close:
+            current.append(line)
+            if html_close in line:
+                html_close = None
+            continue
+        if not line.strip():
+            if current:
+                blank_run.append(line)
+            continue
+        if blank_run:
+            continues = line[:1] in (" ", "\t") or (
+                LIST_ITEM_RE.match(current[0]) and LIST_ITEM_RE.match(line)
+            )
+            if continues:
+                current.extend(blank_run)
+            else:
+                blocks.append("\n".join(current))
+                current = []
+            blank_run = []
+        current.append(line)
+        html_match = HTML_BLOCK_RE.match(line) if len(current) == 1 else None
+        if html_match and f"</{html_match.group(1)}>" not in line:
+            html_close = f"</{html_match.group(1)}>"
+        fence_match = FENCE_RE.match(line)
+        if fence_match:
+            fence = fence_match.group(1)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+class MarkdownCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        """
+        max_bytes: total size of cached HTML before least recently used entries are dropped
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (sha256, extras) -> html
+        self._total_bytes = 0
+
+    @staticmethod
+    def make_key(text, extras):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest(), tuple(sorted(extras))
+
+    def to_html(self, text, extras=MARKDOWN_EXTRAS):
+        """HTML for one piece of markdown, converted at most once while cached."""
+        key = self.make_key(text, extras)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = markdown2.markdown(text, extras=list(extras))
+        size = len(html)
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = html
+                self._total_bytes += size
+                while self._total_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._total_bytes -= len(evicted)
+        return html
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
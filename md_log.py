@@ -0,0 +1,164 @@
+"""
+Append-only log for unit markdown sources.
+
+Unit_N.md stays a readable markdown file, but every addition is written as a
+framed entry at the end of the file (opened in append mode, never rewritten):
+
+    <!-- unit-sync-entry ts=2025-12-26T01:38:00 len=1234 sha256=... -->
+    ...exactly `len` bytes of markdown...
+
+Unit_N.md.idx holds one fixed-size record per entry (content offset, length,
+timestamp, sha256), so the last N entries can be read with two seeks instead
+of loading the whole file. The index can always be rebuilt from the frames.
+"""
+
+import hashlib
+import os
+import re
+import struct
+from datetime import datetime
+from pathlib import Path
+
+FRAME_RE = re.compile(
+    rb"<!-- unit-sync-entry ts=(\S+) len=(\d+) sha256=([0-9a-f]{64}) -->\n"
+)
+# content offset, content length, unix timestamp, sha256 digest
+INDEX_RECORD = struct.Struct(">QIQ32s")
+
+
+def index_path(md_path):
+    md_path = Path(md_path)
+    return md_path.with_name(md_path.name + ".idx")
+
+
+def _frame(content_bytes, when):
+    digest = hashlib.sha256(content_bytes).hexdigest()
+    ts = when.isoformat(timespec="seconds")
+    return f"<!-- unit-sync-entry ts={ts} len={len(content_bytes)} sha256={digest} -->\n".encode("utf-8")
+
+
+def _record(offset, content_bytes, when):
+    return INDEX_RECORD.pack(offset, len(content_bytes), int(when.timestamp()), hashlib.sha256(content_bytes).digest())
+
+
+def append_entry(md_path, content, when=None):
+    """Append one framed entry to the log and its index record."""
+    md_path = Path(md_path)
+    when = when or datetime.now()
+    content_bytes = content.encode("utf-8")
+    frame = _frame(content_bytes, when)
+
+    _repair_index(md_path)
+    with open(md_path, "ab") as f:
+        offset = f.tell() + len(frame)
+        f.write(frame + content_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+    with open(index_path(md_path), "ab") as f:
+        f.write(_record(offset, content_bytes, when))
+
+
+def reset_log(md_path, content, when=None):
+    """Replace the whole log with a single entry (used for overwrite/create)."""
+    md_path = Path(md_path)
+    when = when or datetime.now()
+    content_bytes = content.encode("utf-8")
+    frame = _frame(content_bytes, when)
+
+    tmp_path = md_path.with_name(md_path.name + ".tmp")
+    tmp_path.write_bytes(frame + content_bytes)
+    os.replace(tmp_path, md_path)
+    tmp_idx = md_path.with_name(md_path.name + ".idx.tmp")
+    tmp_idx.write_bytes(_record(len(frame), content_bytes, when))
+    os.replace(tmp_idx, index_path(md_path))
+
+
+def _scan(data):
+    """
+    Yield (offset, content, timestamp) for each intact entry in log bytes.
+
+    Entries with a bad length or hash (torn writes) are skipped. Unframed
+    text from before the log existed counts as one entry with timestamp None.
+    """
+    first = FRAME_RE.search(data)
+    if first is None or first.start() > 0:
+        legacy = data[:first.start() if first else len(data)]
+        if legacy.strip():
+            yield 0, legacy, None
+    for match in FRAME_RE.finditer(data):
+        start, length = match.end(), int(match.group(2))
+        content = data[start:start + length]
+        if len(content) != length or hashlib.sha256(content).hexdigest() != match.group(3).decode():
+            continue  # torn write
+        yield start, content, datetime.fromisoformat(match.group(1).decode())
+
+
+def rebuild_index(md_path):
+    """Scan the log and rewrite its index. Entries with a bad length or hash are skipped."""
+    md_path = Path(md_path)
+    records = []
+    for offset, content, when in _scan(md_path.read_bytes()):
+        when = when or datetime.fromtimestamp(md_path.stat().st_mtime)
+        records.append(_record(offset, content, when))
+
+    tmp_idx = md_path.with_name(md_path.name + ".idx.tmp")
+    tmp_idx.write_bytes(b"".join(records))
+    os.replace(tmp_idx, index_path(md_path))
+    return len(records)
+
+
+def _repair_index(md_path):
+    """Rebuild the index if it is missing or does not cover the end of the log."""
+    if not md_path.exists():
+        index_path(md_path).unlink(missing_ok=True)
+        return
+    idx = index_path(md_path)
+    size = idx.stat().st_size if idx.exists() else 0
+    if size == 0 or size % INDEX_RECORD.size:
+        rebuild_index(md_path)
+        return
+    with open(idx, "rb") as f:
+        f.seek(size - INDEX_RECORD.size)
+        offset, length, _, _ = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+    if offset + length != md_path.stat().st_size:
+        rebuild_index(md_path)
+
+
+def last_entries(md_path, n):
+    """
+    Return the last n entries as dicts (timestamp, content, sha256), oldest first.
+
+    Only the tail of the index and the matching byte ranges of the log are read.
+    """
+    md_path = Path(md_path)
+    if n <= 0 or not md_path.exists():
+        return []
+    _repair_index(md_path)
+    idx = index_path(md_path)
+    count = idx.stat().st_size // INDEX_RECORD.size
+    n = min(n, count)
+    with open(idx, "rb") as f:
+        f.seek((count - n) * INDEX_RECORD.size)
+        raw = f.read(n * INDEX_RECORD.size)
+
+    entries = []
+    with open(md_path, "rb") as f:
+        for offset, length, ts, digest in INDEX_RECORD.iter_unpack(raw):
+            f.seek(offset)
+            entries.append({
+                "timestamp": datetime.fromtimestamp(ts),
+                "content": f.read(length).decode("utf-8", errors="replace"),
+                "sha256": digest.hex(),
+            })
+    return entries
+
+
+def read_text(md_path):
+    """
+    The whole log as plain markdown: the content of every intact entry.
+
+    Frames are dropped, and so are the bytes of a torn write, which would
+    otherwise run into the entry after it.
+    """
+    data = Path(md_path).read_bytes()
+    return b"".join(content for _, content, _ in _scan(data)).decode("utf-8", errors="replace")
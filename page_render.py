@@ -0,0 +1,279 @@
+"""
+Page rasterisation for the Library tab.
+
+Rendered page images are cached on disk, keyed by the content hash of the
+PDF they come from, the page index, DPI and image format. Segmented units
+are rasterised straight from their immutable segments, so pages already seen
+stay cached when a new segment is appended. Older single-file units are
+keyed by the hash of the whole Unit_N.pdf.
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+import unit_store
+from disk_cache import DiskCache
+
+A4_WIDTH_PT = 595.28  # rendered notes are laid out on A4
+HASH_MEMO_ENTRIES = 1024  # file versions whose hash is remembered, least recently used dropped first
+
+_hash_memo = OrderedDict()
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    """sha256 of a file, memoised by (path, size, mtime) for the HASH_MEMO_ENTRIES most recently used versions."""
+    path = Path(path)
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            _hash_memo.move_to_end(memo_key)
+            return _hash_memo[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    sha = digest.hexdigest()
+    with _hash_lock:
+        _hash_memo[memo_key] = sha
+        while len(_hash_memo) > HASH_MEMO_ENTRIES:
+            _hash_memo.popitem(last=False)
+    return sha
+
+
+def page_sources(subject_path, unit):
+    """
+    Where each page of a unit comes from: a list of (pdf_path, page_index, pdf_hash).
+
+    Segmented units map to their segment files; others to Unit_N.pdf.
+    """
+    manifest = unit_store.load_manifest(subject_path, unit)
+    if manifest is not None:
+        seg_dir = unit_store.segments_dir(subject_path, unit)
+        return [
+            (seg_dir / seg["file"], index, seg["sha256"])
+            for seg in manifest["segments"]
+            for index in range(seg["pages"])
+        ]
+    pdf_path = unit_store.unit_pdf_path(subject_path, unit)
+    if not pdf_path.exists():
+        return []
+    with fitz.open(pdf_path) as doc:
+        count = doc.page_count
+    pdf_hash = file_hash(pdf_path)
+    return [(pdf_path, index, pdf_hash) for index in range(count)]
+
+
+def dpi_for_width(width_px, page_width_pt=A4_WIDTH_PT):
+    """DPI at which a page rasterises to roughly width_px pixels across."""
+    return max(36, round(width_px * 72 / page_width_pt))
+
+
+def width_for_dpi(dpi, page_width_pt=A4_WIDTH_PT):
+    """Pixel width of a page rasterised at dpi (MuPDF rounds partial pixels up)."""
+    return math.ceil(page_width_pt * dpi / 72)
+
+
+def rasterize_page(pdf_path, page_index, dpi, fmt="png", quality=85, gray=False):
+    """
+    Render one PDF page to image bytes.
+
+    fmt: "png" or "jpeg" (quality only applies to jpeg)
+    gray: render in grayscale, which roughly thirds the pixel data
+    """
+    return rasterize_pages(pdf_path, [page_index], dpi, fmt, quality, gray)[0]
+
+
+def rasterize_pages(pdf_path, page_indexes, dpi, fmt="png", quality=85, gray=False):
+    """Render several pages of one PDF, opening it once. Runs in worker processes."""
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+    images = []
+    with fitz.open(pdf_path) as doc:
+        for page_index in page_indexes:
+            pix = doc[page_index].get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+            images.append(pix.tobytes("jpg", jpg_quality=quality) if fmt in ("jpeg", "jpg") else pix.tobytes(fmt))
+    return images
+
+
+class PageCache:
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        """
+        directory: folder holding cached page images
+        max_bytes: total size budget before least recently used pages are evicted
+        """
+        self.cache = DiskCache(directory, max_bytes=max_bytes, suffix=".img")
+        self._prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-prefetch")
+        self._inflight = {}  # key -> Future, so a page is never rendered twice at once
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(pdf_hash, page_index, dpi, fmt, quality=85, gray=False):
+        key = f"{pdf_hash[:32]}-p{page_index}-{dpi}dpi-{fmt}"
+        if fmt != "png":
+            key += f"-q{quality}"
+        if gray:
+            key += "-gray"
+        return key
+
+    def has_page(self, source, dpi, fmt="png", quality=85, gray=False):
+        """Whether a page is already cached at these settings (does not touch LRU order)."""
+        return self.make_key(source[2], source[1], dpi, fmt, quality, gray) in self.cache
+
+    def get_page(self, source, dpi, fmt="png", quality=85, gray=False):
+        """Image bytes for a (pdf_path, page_index, pdf_hash) source, rendering on a miss."""
+        pdf_path, page_index, pdf_hash = source
+        key = self.make_key(pdf_hash, page_index, dpi, fmt, quality, gray)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            # Someone (usually the prefetcher) is already rendering this page
+            return future.result()
+        try:
+            data = rasterize_page(pdf_path, page_index, dpi, fmt, quality, gray)
+            self.cache.put(key, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def iter_pages(self, sources, dpi, fmt="png", quality=85, gray=False, submit=None, workers=1):
+        """
+        Yield (position, image bytes) for every source, in the order they become ready.
+
+        Cached pages come first. Misses are split into up to `workers` runs of
+        pages from the same PDF and rasterised through `submit` (which starts a
+        call on a process pool and returns its Future, like an executor's
+        submit), each worker opening its own copy of the document. Without it
+        the misses are rendered here one by one.
+        """
+        missing = []
+        for position, source in enumerate(sources):
+            data = self.cache.get(self.make_key(source[2], source[1], dpi, fmt, quality, gray))
+            if data is not None:
+                yield position, data
+            else:
+                missing.append(position)
+        if submit is None or len(missing) < 2:
+            for position in missing:
+                yield position, self.get_page(sources[position], dpi, fmt, quality, gray)
+            return
+
+        def key_of(position):
+            return self.make_key(sources[position][2], sources[position][1], dpi, fmt, quality, gray)
+
+        # Claim the misses nobody else is rendering; wait on the others
+        claimed, waiting = [], []
+        with self._inflight_lock:
+            for position in missing:
+                key = key_of(position)
+                if key in self._inflight:
+                    waiting.append((position, self._inflight[key]))
+                else:
+                    self._inflight[key] = Future()
+                    claimed.append(position)
+
+        run_size = max(1, math.ceil(len(claimed) / workers))
+        runs = []
+        for position in claimed:
+            if runs and len(runs[-1]) < run_size and sources[runs[-1][-1]][0] == sources[position][0]:
+                runs[-1].append(position)
+            else:
+                runs.append([position])
+
+        unfinished = set(claimed)
+        futures = {}
+        try:
+            for run in runs:
+                args = (sources[run[0]][0], [sources[p][1] for p in run], dpi, fmt, quality, gray)
+                try:
+                    futures[submit(rasterize_pages, *args)] = (run, args)
+                except Exception:
+                    futures[_finished(rasterize_pages(*args))] = (run, args)
+            for future in as_completed(futures):
+                run, args = futures[future]
+                try:
+                    images = future.result()
+                except Exception:
+                    # A dead or busy pool should not stop the page from showing
+                    images = rasterize_pages(*args)
+                for position, data in zip(run, images):
+                    self.cache.put(key_of(position), data)
+                    self._release(key_of(position), result=data)
+                    unfinished.discard(position)
+                    yield position, data
+        finally:
+            for future in futures:
+                future.cancel()
+            for position in unfinished:
+                self._release(key_of(position), error=RuntimeError("Page render was abandoned"))
+
+        for position, future in waiting:
+            yield position, future.result()
+
+    def _release(self, key, result=None, error=None):
+        with self._inflight_lock:
+            future = self._inflight.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def prefetch(self, sources, dpi, fmt="png", quality=85, gray=False):
+        """Render pages in the background so they are cached before they are viewed."""
+        for source in sources:
+            key = self.make_key(source[2], source[1], dpi, fmt, quality, gray)
+            if key in self.cache:
+                continue
+            with self._inflight_lock:
+                if key in self._inflight:
+                    continue
+            self._prefetcher.submit(self._prefetch_one, source, dpi, fmt, quality, gray)
+
+    def _prefetch_one(self, source, dpi, fmt, quality, gray):
+        try:
+            self.get_page(source, dpi, fmt, quality, gray)
+        except Exception:
+            pass  # the page is rendered (and the error shown) when it is viewed
+
+    def discard_pdf(self, pdf_hash):
+        """Drop every cached page of one PDF version."""
+        self.cache.discard_prefix(pdf_hash[:32] + "-")
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def _finished(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def pdf_hashes(subject_path, unit):
+    """Content hashes of the PDFs a unit's pages currently come from."""
+    manifest = unit_store.load_manifest(subject_path, unit)
+    if manifest is not None:
+        return {seg["sha256"] for seg in manifest["segments"]}
+    pdf_path = unit_store.unit_pdf_path(subject_path, unit)
+    return {file_hash(pdf_path)} if pdf_path.exists() else set()
@@ -0,0 +1,324 @@
+"""
+Incremental-update appends for unit PDFs.
+
+Instead of re-parsing and re-serialising the whole unit on every append, the
+new pages are written as a PDF incremental update: the new objects plus a new
+xref/trailer section are added to the end of the existing file. Only the tail
+of the existing file is read (its trailer, xref entries and page tree root),
+so an append costs the same however long the unit has grown. Every few
+updates the file is compacted back into a single clean revision.
+"""
+
+import io
+import os
+import re
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PyPdfError
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    read_object,
+)
+
+# Fold incremental updates back into one revision after this many
+COMPACT_AFTER = 20
+# Bytes read from the end of a file to find its last startxref
+TAIL_BYTES = 1024
+
+STARTXREF_RE = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+OBJ_HEADER_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+XREF_ENTRY_BYTES = 20
+
+
+class _TailReader:
+    """
+    Resolves objects of an existing PDF through its xref table chain,
+    reading only the sections and objects asked for.
+
+    Passed to pypdf's read_object as the document, so references inside
+    parsed objects resolve through it too.
+    """
+
+    strict = False
+
+    def __init__(self, f):
+        """f: PDF file opened in binary mode"""
+        self.f = f
+        f.seek(0, os.SEEK_END)
+        self.size = f.tell()
+        f.seek(max(0, self.size - TAIL_BYTES))
+        tail = f.read()
+        matches = list(STARTXREF_RE.finditer(tail))
+        if not matches:
+            raise ValueError("no startxref at the end of the file")
+        self.startxref = int(matches[-1].group(1))
+        self.ends_with_newline = tail.endswith((b"\n", b"\r"))
+        self._sections = []  # (subsections, trailer), newest first
+        self._next_section = self.startxref
+        self.trailer = self._section(0)[1]
+
+    def _section(self, index):
+        """The index-th xref section counting back from the newest, or None past the first."""
+        while len(self._sections) <= index and self._next_section is not None:
+            self._sections.append(self._read_section(self._next_section))
+            prev = self._sections[-1][1].get("/Prev")
+            self._next_section = None if prev is None else int(prev)
+        return self._sections[index] if index < len(self._sections) else None
+
+    def _read_section(self, offset):
+        f = self.f
+        f.seek(offset)
+        if f.readline().strip() != b"xref":
+            # Cross-reference streams are not read here; the caller falls back
+            raise ValueError(f"no xref table at byte {offset}")
+        subsections = []  # (first object number, count, offset of the first entry)
+        while True:
+            line_start = f.tell()
+            line = f.readline()
+            if not line:
+                raise ValueError("xref table ends without a trailer")
+            if line.lstrip().startswith(b"trailer"):
+                rest = line[line.index(b"trailer") + len(b"trailer"):]
+                f.seek(line_start + len(line) - len(rest.lstrip()))
+                if not rest.strip():
+                    _skip_whitespace(f)
+                trailer = read_object(f, self)
+                if not isinstance(trailer, DictionaryObject):
+                    raise ValueError("malformed trailer")
+                return subsections, trailer
+            if not line.strip():
+                continue
+            first, count = (int(part) for part in line.split())
+            subsections.append((first, count, f.tell()))
+            f.seek(f.tell() + count * XREF_ENTRY_BYTES)
+
+    def offset(self, idnum):
+        """Byte offset of an object from its newest xref entry (None if free or missing)."""
+        index = 0
+        while (section := self._section(index)) is not None:
+            for first, count, entries in section[0]:
+                if first <= idnum < first + count:
+                    self.f.seek(entries + (idnum - first) * XREF_ENTRY_BYTES)
+                    entry = self.f.read(XREF_ENTRY_BYTES)
+                    return int(entry[:10]) if entry[17:18] == b"n" else None
+            index += 1
+        return None
+
+    def get_object(self, ref):
+        idnum = ref.idnum if isinstance(ref, IndirectObject) else int(ref)
+        offset = self.offset(idnum)
+        if offset is None:
+            return None
+        f = self.f
+        position = f.tell()  # read_object may be resolving a /Length mid-stream
+        f.seek(offset)
+        header = OBJ_HEADER_RE.match(f.read(32))
+        if header is None or int(header.group(1)) != idnum:
+            raise ValueError(f"xref entry for object {idnum} points at byte {offset}")
+        f.seek(offset + header.end())
+        _skip_whitespace(f)
+        obj = read_object(f, self)
+        f.seek(position)
+        return obj
+
+
+def _skip_whitespace(f):
+    """Move f to the next non-whitespace byte (read_object expects to start on a token)."""
+    while (char := f.read(1)) and char.isspace():
+        pass
+    if char:
+        f.seek(-1, os.SEEK_CUR)
+
+
+def _renumber(obj, ref):
+    """Point every reference inside obj at its number in the update (in place)."""
+    if isinstance(obj, DictionaryObject):
+        for key, value in list(obj.items()):
+            if isinstance(value, IndirectObject):
+                obj[key] = ref(value)
+            else:
+                _renumber(value, ref)
+    elif isinstance(obj, ArrayObject):
+        for i, value in enumerate(obj):
+            if isinstance(value, IndirectObject):
+                obj[i] = ref(value)
+            else:
+                _renumber(value, ref)
+
+
+def _build_update(existing, new_readers):
+    """
+    Bytes of an incremental update adding the pages of new_readers to the
+    document behind existing (a _TailReader).
+
+    Returns (update, expected page count).
+    """
+    trailer = existing.trailer
+    root = existing.get_object(trailer.raw_get("/Root"))
+    pages_ref = root.raw_get("/Pages")
+    if not isinstance(pages_ref, IndirectObject) or pages_ref.generation != 0:
+        raise ValueError("page tree root is not a generation 0 indirect object")
+    pages = existing.get_object(pages_ref)
+    kids = ArrayObject(pages["/Kids"])
+    count = int(pages["/Count"])
+
+    next_id = int(trailer["/Size"])
+    objects = {}  # object number in the update -> object
+    for reader in new_readers:
+        page_objects = {page.indirect_reference.idnum: page for page in reader.pages}
+        numbers = {}  # object number in reader -> number in the update
+        pending = []
+
+        def ref(indirect):
+            nonlocal next_id
+            if indirect.pdf is not reader:
+                return indirect  # already points into the existing file
+            if indirect.idnum not in numbers:
+                numbers[indirect.idnum] = next_id
+                next_id += 1
+                pending.append(indirect.idnum)
+            return IndirectObject(numbers[indirect.idnum], 0, existing)
+
+        for page in reader.pages:
+            page[NameObject("/Parent")] = pages_ref
+            kids.append(ref(page.indirect_reference))
+        count += len(reader.pages)
+        while pending:
+            idnum = pending.pop()
+            obj = page_objects[idnum] if idnum in page_objects else reader.get_object(idnum)
+            _renumber(obj, ref)
+            objects[numbers[idnum]] = obj
+
+    pages = DictionaryObject(pages)
+    pages[NameObject("/Kids")] = kids
+    pages[NameObject("/Count")] = NumberObject(count)
+    objects[pages_ref.idnum] = pages
+
+    buffer = io.BytesIO()
+    if not existing.ends_with_newline:
+        buffer.write(b"\n")
+    offsets = {}
+    for idnum in sorted(objects):
+        offsets[idnum] = existing.size + buffer.tell()
+        buffer.write(f"{idnum} 0 obj\n".encode())
+        objects[idnum].write_to_stream(buffer)
+        buffer.write(b"\nendobj\n")
+
+    xref_offset = existing.size + buffer.tell()
+    # Start with the free-list head so readers see a zero-indexed table
+    buffer.write(b"xref\n0 1\n0000000000 65535 f \n")
+    ids = sorted(offsets)
+    start = 0
+    for end in range(1, len(ids) + 1):
+        if end == len(ids) or ids[end] != ids[end - 1] + 1:
+            buffer.write(f"{ids[start]} {end - start}\n".encode())
+            for idnum in ids[start:end]:
+                buffer.write(f"{offsets[idnum]:010d} 00000 n \n".encode())
+            start = end
+
+    new_trailer = DictionaryObject()
+    new_trailer[NameObject("/Size")] = NumberObject(next_id)
+    new_trailer[NameObject("/Root")] = trailer.raw_get("/Root")
+    new_trailer[NameObject("/Prev")] = NumberObject(existing.startxref)
+    for key in ("/Info", "/ID"):
+        if key in trailer:
+            new_trailer[NameObject(key)] = trailer.raw_get(key)
+    buffer.write(b"trailer\n")
+    new_trailer.write_to_stream(buffer)
+    buffer.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return buffer.getvalue(), count
+
+
+def _check_update(path, previous_startxref, expected_pages):
+    """Validate only the newest revision of the PDF at path."""
+    with open(path, "rb") as f:
+        updated = _TailReader(f)
+        if int(updated.trailer["/Prev"]) != previous_startxref:
+            return False
+        root = updated.get_object(updated.trailer.raw_get("/Root"))
+        pages = updated.get_object(root.raw_get("/Pages"))
+        if int(pages["/Count"]) != expected_pages or len(pages["/Kids"]) == 0:
+            return False
+        # Every object in the new section must be where its xref entry says
+        for first, count, _ in updated._section(0)[0]:
+            for idnum in range(max(first, 1), first + count):
+                if updated.get_object(idnum) is None:
+                    return False
+        return True
+
+
+def append_pdf(unit_path, new_pdfs, revisions=1, compact_after=COMPACT_AFTER):
+    """
+    Append the pages of each PDF in new_pdfs (bytes) to the PDF at unit_path.
+
+    The pages go out as one incremental update written to the end of the
+    file in place, so the cost depends only on the new pages. If the write
+    or the check of the new revision fails, the file is cut back to its old
+    length. Callers keep writers of one file apart (unit_store's unit lock).
+    revisions is how many revisions the file already has (kept by the
+    caller). Returns how many it has afterwards: 1 when the whole file was
+    rewritten (compaction or fallback).
+    """
+    unit_path = Path(unit_path)
+    new_readers = [PdfReader(io.BytesIO(data)) for data in new_pdfs]
+    try:
+        with open(unit_path, "rb") as f:
+            existing = _TailReader(f)
+            update, expected_pages = _build_update(existing, new_readers)
+    except (PyPdfError, ValueError, KeyError, TypeError):
+        valid = False
+    else:
+        with open(unit_path, "ab") as f:
+            try:
+                f.write(update)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                # Never leave a half-written update behind
+                f.truncate(existing.size)
+                raise
+        try:
+            valid = _check_update(unit_path, existing.startxref, expected_pages)
+        except (PyPdfError, ValueError, KeyError, TypeError):
+            valid = False
+        if not valid:
+            os.truncate(unit_path, existing.size)
+    if not valid:
+        # Not a file we can update incrementally; do a full merge instead
+        merged = PdfWriter()
+        merged.append(str(unit_path))
+        for reader in new_readers:
+            merged.append(reader)
+        buffer = io.BytesIO()
+        merged.write(buffer)
+        _replace(unit_path, buffer.getvalue())
+        return 1
+
+    if revisions + 1 > compact_after:
+        compact_pdf(unit_path)
+        return 1
+    return revisions + 1
+
+
+def compact_pdf(unit_path):
+    """Rewrite a PDF as a single revision, dropping superseded objects."""
+    unit_path = Path(unit_path)
+    writer = PdfWriter(clone_from=PdfReader(unit_path))
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    _replace(unit_path, buffer.getvalue())
+
+
+def _replace(path, data):
+    """Atomically replace the file at path with data."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,215 @@
+"""
+PDF rendering for unit notes.
+
+Kept free of Streamlit so the render step can run inside worker processes
+(see render_service.RenderService).
+"""
+
+import hashlib
+import io
+
+import markdown2
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from xhtml2pdf import pisa
+
+import styling
+from markdown_cache import MARKDOWN_EXTRAS
+
+
+# Paper White Theme for Professional Printing
+PDF_STYLESHEET = """
+    @page {
+        size: A4;
+        margin: 2cm;
+    }
+    
+    body {
+        font-family: 'Georgia', 'Times New Roman', serif;
+        font-size: 11pt;
+        line-height: 1.7;
+        color: #4A5568;
+        background: #FFFFFF;
+    }
+    
+    /* Paper White Headers - Teal inspired */
+    h1 {
+        font-size: 22pt;
+        font-weight: 700;
+        color: #2D7A72;
+        border-bottom: 2px solid #B2DFDB;
+        padding-bottom: 8px;
+        margin-bottom: 16px;
+    }
+    
+    h2 {
+        font-size: 16pt;
+        font-weight: 600;
+        color: #2D7A72;
+        margin-top: 1.5em;
+        padding-left: 10px;
+        border-left: 3px solid #80CBC4;
+    }
+    
+    h3 {
+        font-size: 13pt;
+        font-weight: 600;
+        color: #4A5568;
+        margin-top: 1.2em;
+    }
+    
+    /* Key points - Peach accent for print */
+    strong {
+        color: #CC9A4E;
+        font-weight: 600;
+    }
+    
+    em {
+        color: #718096;
+        font-style: italic;
+    }
+    
+    code {
+        background: #F7FAFC;
+        padding: 2px 6px;
+        border-radius: 3px;
+        font-family: 'Consolas', monospace;
+        font-size: 10pt;
+        color: #4A5568;
+        border: 1px solid #E2E8F0;
+    }
+    
+    pre {
+        background: #F7FAFC;
+        border: 1px solid #E2E8F0;
+        border-radius: 6px;
+        padding: 14px;
+        overflow-x: auto;
+        margin: 1em 0;
+    }
+    
+    pre code {
+        background: transparent;
+        border: none;
+        color: #4A5568;
+    }
+    
+    blockquote {
+        border-left: 3px solid #80CBC4;
+        margin: 1em 0;
+        padding: 10px 14px;
+        background: #F0FDFA;
+        border-radius: 0 6px 6px 0;
+    }
+    
+    /* Tables */
+    table {
+        border-collapse: collapse;
+        width: 100%;
+        margin: 1em 0;
+    }
+    
+    th {
+        background: #80CBC4;
+        color: #1A202C;
+        font-weight: 600;
+        padding: 10px;
+        text-align: left;
+    }
+    
+    td {
+        border: 1px solid #E2E8F0;
+        padding: 8px 10px;
+    }
+    
+    tr:nth-child(even) {
+        background: #F7FAFC;
+    }
+    
+    hr {
+        border: none;
+        border-top: 1px solid #E2E8F0;
+        margin: 1.5em 0;
+    }
+    
+    ul li::marker {
+        color: #80CBC4;
+    }
+    
+    ol li::marker {
+        color: #2D7A72;
+        font-weight: 600;
+    }
+    
+    /* Key points: text before a colon at the start of a paragraph (Peach) */
+    .key-point {
+        color: #CC9A4E;
+        font-weight: 600;
+    }
+"""
+
+# Bump when the markdown -> HTML -> PDF pipeline changes so cached renders are dropped
+PDF_RENDER_VERSION = 6
+PDF_STYLESHEET_VERSION = hashlib.sha256(PDF_STYLESHEET.encode("utf-8")).hexdigest()[:12]
+
+
+def render_notes_pdf(body_html, subject, unit):
+    """
+    Render unit notes to PDF bytes.
+    
+    The result does not depend on when it is rendered, so it can be cached;
+    stamp_updated_on adds the date to each copy that is saved.
+    
+    body_html is the notes' markdown already converted to HTML (see
+    markdown_cache.MarkdownCache.to_html), so the parse is cached and shared
+    instead of being repeated in the worker.
+    
+    Returns (pdf_bytes, error_count) where error_count comes from pisa.
+    """
+    # Add Header
+    header_md = f"# 📘 {subject} - Unit {unit}\n\n---\n\n"
+    header_html = markdown2.markdown(header_md, extras=list(MARKDOWN_EXTRAS))
+    
+    # Key points (text before colons in Peach), via the shared styling stage
+    html_content = styling.style_key_points(header_html + body_html)
+    
+    styled_html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+{PDF_STYLESHEET}
+        </style>
+    </head>
+    <body>
+        {html_content}
+    </body>
+    </html>
+    """
+    
+    # Generate PDF
+    pdf_buffer = io.BytesIO()
+    status = pisa.CreatePDF(styled_html, dest=pdf_buffer)
+    return pdf_buffer.getvalue(), status.err
+
+
+def stamp_updated_on(pdf_bytes, timestamp):
+    """Write "Updated on: <timestamp>" in the top margin of the first page."""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    width, height = float(reader.pages[0].mediabox.width), float(reader.pages[0].mediabox.height)
+    overlay = io.BytesIO()
+    stamp = canvas.Canvas(overlay, pagesize=(width, height))
+    stamp.setFont("Times-Italic", 9)
+    stamp.setFillColor(HexColor("#718096"))
+    # Right-aligned with the text column, halfway into the 2cm page margin
+    stamp.drawRightString(width - 2 * cm, height - 1.2 * cm, f"Updated on: {timestamp}")
+    stamp.save()
+
+    writer = PdfWriter(clone_from=reader)
+    writer.pages[0].merge_page(PdfReader(overlay).pages[0])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
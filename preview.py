@@ -0,0 +1,103 @@
+"""
+Incremental rendering for the editor preview.
+
+The markdown is split into top-level blocks (paragraphs, headings, lists,
+fenced code, tables...) and each block is converted (through the shared
+markdown cache) and styled on its own. Styled blocks are kept in a bounded
+in-memory LRU keyed by the block's content hash, so a keystroke only
+re-renders the block being edited and the cost of a rerun stays flat as
+notes grow. Heading ids repeated across blocks are numbered the way a
+whole-document conversion would number them.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from markdown_cache import MARKDOWN_EXTRAS, MarkdownCache, split_blocks
+
+HEADER_ID_RE = re.compile(r'(<h[1-6]\b[^>]*\bid=")([^"]*)(")')
+
+
+class PreviewRenderer:
+    def __init__(self, max_blocks=4000, markdown_cache=None, extras=MARKDOWN_EXTRAS):
+        """
+        max_blocks: styled blocks kept in memory (least recently used are dropped)
+        markdown_cache: MarkdownCache doing the markdown -> HTML step
+        extras: markdown2 extras used for every block
+        """
+        self.max_blocks = max_blocks
+        self.markdown_cache = markdown_cache or MarkdownCache()
+        self.extras = tuple(extras)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()  # (block hash, style key) -> (html, heading ids)
+
+    def render(self, markdown_text, style=None, style_key=None):
+        """
+        Render markdown as a list of (block_id, html).
+
+        style: optional callable applied to each block's HTML
+        style_key: changes whenever style would produce different output
+        Block ids are stable while a block's text is unchanged.
+        """
+        rendered = []
+        seen = {}
+        header_ids = {}  # heading id -> times used so far
+        for block in split_blocks(markdown_text):
+            digest = hashlib.sha1(block.encode("utf-8")).hexdigest()[:16]
+            # The same block can appear twice; keep ids unique
+            seen[digest] = seen.get(digest, 0) + 1
+            block_id = digest if seen[digest] == 1 else f"{digest}-{seen[digest]}"
+            html, ids = self._render_block(block, digest, style, style_key)
+            if any(header_id in header_ids for header_id in ids):
+                html, renamed = self._number_header_ids(html, header_ids)
+                # Same text, different HTML: the component must not reuse the old block
+                block_id = f"{block_id}#{','.join(renamed)}"
+            else:
+                for header_id in ids:
+                    header_ids[header_id] = header_ids.get(header_id, 0) + 1
+            rendered.append((block_id, html))
+        return rendered
+
+    @staticmethod
+    def _number_header_ids(html, header_ids):
+        """Give repeated heading ids a -2, -3... suffix, as markdown2 does within one document."""
+        renamed = []
+
+        def number(match):
+            header_id = match.group(2)
+            header_ids[header_id] = header_ids.get(header_id, 0) + 1
+            if header_ids[header_id] == 1:
+                return match.group(0)
+            renamed.append(f"{header_id}-{header_ids[header_id]}")
+            return match.group(1) + renamed[-1] + match.group(3)
+
+        return HEADER_ID_RE.sub(number, html), renamed
+
+    def _render_block(self, block, digest, style, style_key):
+        """(html, heading ids in it) for one block."""
+        key = (digest, style_key)
+        with self._lock:
+            entry = self._blocks.get(key)
+            if entry is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        html = self.markdown_cache.to_html(block, self.extras)
+        if style is not None:
+            html = style(html)
+        entry = (html, tuple(match.group(2) for match in HEADER_ID_RE.finditer(html)))
+        with self._lock:
+            self._blocks[key] = entry
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._blocks)}
@@ -0,0 +1,165 @@
+// Live preview component.
+//
+// The frame is created once per session and kept across Streamlit reruns.
+// Each render sends the block order plus the HTML of blocks this frame has
+// not seen yet; blocks already on screen are reused in place, so updates
+// move only the changed content and the scroll position is kept.
+
+// ============ STREAMLIT PROTOCOL ============
+
+function sendMessage(type, data) {
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), '*');
+}
+
+const MOUNT_ID = Math.random().toString(36).slice(2);
+let resendRequests = 0;
+let frameHeight = null;
+const blocks = new Map();  // block id -> element
+
+function requestResend() {
+    // A new value reruns the script, which then sends every block again
+    resendRequests += 1;
+    sendMessage('streamlit:setComponentValue', {
+        value: { kind: 'resend', mount: MOUNT_ID, request: resendRequests },
+        dataType: 'json'
+    });
+}
+
+function patchBlocks(order, html) {
+    if (order.some(id => !(id in html) && !blocks.has(id))) {
+        requestResend();
+        return;
+    }
+    const content = document.getElementById('content');
+    let cursor = content.firstChild;
+    for (const id of order) {
+        let el = blocks.get(id);
+        if (!el) {
+            el = document.createElement('div');
+            el.className = 'md-block';
+            el.dataset.block = id;
+            el.innerHTML = html[id];
+            blocks.set(id, el);
+        }
+        if (el === cursor) {
+            cursor = cursor.nextSibling;
+        } else {
+            content.insertBefore(el, cursor);
+        }
+    }
+    const keep = new Set(order);
+    for (const [id, el] of blocks) {
+        if (!keep.has(id)) {
+            el.remove();
+            blocks.delete(id);
+        }
+    }
+}
+
+window.addEventListener('message', event => {
+    if (event.data.type !== 'streamlit:render') return;
+    const args = event.data.args;
+    if (args.height !== frameHeight) {
+        frameHeight = args.height;
+        sendMessage('streamlit:setFrameHeight', { height: frameHeight });
+    }
+    patchBlocks(args.order, args.blocks);
+    receiveDefinition(args.definition);
+});
+
+// ============ SELECT-TO-DEFINE ============
+
+let tooltip = null;
+
+function removeTooltip() {
+    if (tooltip) {
+        tooltip.style.animation = 'tooltipFadeOut 0.15s ease forwards';
+        setTimeout(() => { if (tooltip) { tooltip.remove(); tooltip = null; } }, 150);
+    }
+}
+
+// Add fade out animation
+const style = document.createElement('style');
+style.textContent = `@keyframes tooltipFadeOut { from { opacity: 1; } to { opacity: 0; transform: translateY(8px); } }`;
+document.head.appendChild(style);
+
+// Lookups go to the app (cached and rate limited there); the answer comes
+// back with the next render as args.definition
+let pendingDefinition = null;
+let definitionRequests = 0;
+
+function getDefinition(term) {
+    if (pendingDefinition) pendingDefinition.resolve(null);
+    definitionRequests += 1;
+    const id = `${MOUNT_ID}-${definitionRequests}`;
+    return new Promise(resolve => {
+        pendingDefinition = { id: id, resolve: resolve };
+        sendMessage('streamlit:setComponentValue', {
+            value: { kind: 'define', id: id, term: term },
+            dataType: 'json'
+        });
+    });
+}
+
+function receiveDefinition(answer) {
+    if (!answer || !pendingDefinition || answer.id !== pendingDefinition.id) return;
+    pendingDefinition.resolve(answer.text ? { success: answer.text } : { error: answer.error });
+    pendingDefinition = null;
+}
+
+function createTooltip(x, y, text) {
+    removeTooltip();
+
+    const t = document.createElement('div');
+    t.className = 'ai-tooltip';
+    t.style.left = Math.min(x + 15, window.innerWidth - 400) + 'px';
+    t.style.top = (y + 220 > window.innerHeight ? Math.max(y - 200, 10) : y + 20) + 'px';
+
+    const displayText = text.length > 35 ? text.substring(0, 35) + '...' : text;
+
+    t.innerHTML = `
+        <div class="tooltip-header">
+            <span class="tooltip-icon">📖</span>
+            <span class="tooltip-term"></span>
+            <span class="tooltip-close" onclick="removeTooltip()">×</span>
+        </div>
+        <div class="tooltip-content">
+            <div class="loading">
+                <div class="loading-dots"><span></span><span></span><span></span></div>
+                <span>Getting definition...</span>
+            </div>
+        </div>
+    `;
+
+    t.querySelector('.tooltip-term').textContent = displayText;
+    document.body.appendChild(t);
+    tooltip = t;
+
+    getDefinition(text).then(r => {
+        if (!r || tooltip !== t) return;
+        const c = t.querySelector('.tooltip-content');
+        const d = document.createElement('div');
+        d.style.color = r.success ? '#E0E0E0' : '#FF5252';
+        d.textContent = r.success || `⚠️ ${r.error}`;
+        c.replaceChildren(d);
+    });
+}
+
+document.addEventListener('mouseup', e => {
+    setTimeout(() => {
+        const sel = window.getSelection().toString().trim();
+        if (sel.length >= 2 && sel.length <= 120 && (!tooltip || !tooltip.contains(e.target))) {
+            createTooltip(e.clientX, e.clientY, sel);
+        }
+    }, 50);
+});
+
+document.addEventListener('mousedown', e => {
+    if (tooltip && !tooltip.contains(e.target) && !window.getSelection().toString().trim()) {
+        removeTooltip();
+    }
+});
+
+document.addEventListener('keydown', e => { if (e.key === 'Escape') removeTooltip(); });
+
+sendMessage('streamlit:componentReady', { apiVersion: 1 });
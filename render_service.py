@@ -0,0 +1,207 @@
+"""
+Background rendering service.
+
+CPU-heavy work (pisa rendering, page rasterisation) runs in process pools so it scales across
+cores instead of competing for one interpreter's GIL. Longer jobs such as a
+whole consolidation are run on a small thread pool that waits on those
+processes, so the Streamlit script thread never blocks on them. Page
+rasterisation has a smaller pool of its own, so scrolling through the
+Library never queues ahead of a consolidation.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Seconds a worker gets past its own deadline before its pool is recycled
+TIMEOUT_GRACE = 5
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when too many jobs are already waiting."""
+
+
+class RenderTimeout(RuntimeError):
+    """Raised when a worker does not finish in time."""
+
+
+def _run_with_deadline(fn, timeout, *args):
+    """
+    Run fn(*args) in a worker process, raising RenderTimeout inside the
+    worker once timeout seconds pass so the worker is free for the next job.
+    """
+    if not hasattr(signal, "setitimer"):
+        return fn(*args)  # no interval timers (Windows): run() recycles the pool instead
+
+    def expire(signum, frame):
+        raise RenderTimeout(f"Rendering took longer than {timeout}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class RenderJob:
+    """Status of one submitted job, safe to poll from the UI."""
+
+    def __init__(self, label, meta=None):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.meta = meta or {}
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def update(self, progress, message):
+        """Progress callback handed to the job function."""
+        self.progress = max(0.0, min(1.0, progress))
+        self.message = message
+
+
+class RenderService:
+    def __init__(self, max_workers=None, max_pending=8, job_timeout=120, keep_finished=300, page_workers=None):
+        """
+        max_workers: render processes (defaults to the CPU count)
+        max_pending: jobs allowed to be queued or running at once
+        job_timeout: seconds a single render may take before it is abandoned
+        keep_finished: seconds finished jobs stay available for polling
+        page_workers: page rasterisation processes (defaults to half of max_workers)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.page_workers = page_workers or max(1, self.max_workers // 2)
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pool = self._new_pool(self.max_workers)
+        self._page_pool = self._new_pool(self.page_workers)
+        self._runner = ThreadPoolExecutor(max_workers=max_pending, thread_name_prefix="render-job")
+
+    def _new_pool(self, workers):
+        # Spawn rather than fork: the Streamlit server is multi-threaded
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def submit_page(self, fn, *args):
+        """Start fn(*args) on the page rasterisation pool; returns its Future."""
+        pool = self._page_pool
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._page_pool is pool:
+                    self._page_pool = self._new_pool(self.page_workers)
+            pool.shutdown(wait=False, cancel_futures=True)
+            return self._page_pool.submit(fn, *args)
+
+    def run(self, fn, *args, timeout=None):
+        """Run fn(*args) in a worker process and wait for the result."""
+        timeout = timeout or self.job_timeout
+        pool = self._pool
+        try:
+            future = pool.submit(_run_with_deadline, fn, timeout, *args)
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            pool = self._pool
+            future = pool.submit(_run_with_deadline, fn, timeout, *args)
+        try:
+            return future.result(timeout=timeout + TIMEOUT_GRACE)
+        except FutureTimeout:
+            # The worker ignored its own deadline (stuck outside Python code).
+            # Leaving it would keep a process busy that max_pending counts as
+            # free, so new work goes to a fresh pool instead.
+            if not future.cancel():
+                self._reset_pool(pool)
+            raise RenderTimeout(f"Rendering took longer than {timeout}s")
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise
+
+    def _reset_pool(self, pool):
+        """
+        Replace pool, if it is still the current one, with a fresh pool: its
+        worker died (e.g. out of memory) or is stuck on a job.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return  # already replaced by another caller
+            self._pool = self._new_pool(self.max_workers)
+        pool.shutdown(wait=False, cancel_futures=True)
+        terminate = getattr(pool, "terminate_workers", None)  # Python 3.14+
+        if terminate is not None:
+            terminate()
+
+    def submit(self, label, fn, *args, meta=None, **kwargs):
+        """
+        Run fn(*args, progress=..., **kwargs) in the background.
+
+        Returns a RenderJob to poll. Raises RenderQueueFull when max_pending
+        jobs are already queued or running.
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_pending:
+                raise RenderQueueFull("The renderer is busy, please try again in a moment")
+            job = RenderJob(label, meta)
+            self._jobs[job.id] = job
+        self._runner.submit(self._execute, job, fn, args, kwargs)
+        return job
+
+    def _execute(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.update(0.05, "Starting...")
+        try:
+            job.result = fn(*args, progress=job.update, **kwargs)
+            job.update(1.0, "Done")
+            job.status = "done"  # last, so a poller that sees it also sees the final progress
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        """Look up a job by id (None once it has expired)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        """Counts of jobs by status."""
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def shutdown(self):
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._page_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,422 @@
+"""
+Handmade-style formatting for rendered note HTML.
+
+Rendered markdown is parsed once into a small element tree and restyled in a
+single traversal: key points, analogy sticky notes, concept headers, info
+cards, quoted text and terminology pills. The same stage serves the editor
+preview and the PDF renderer (which enables only the touches xhtml2pdf can
+draw). Working on the tree means nothing lands inside tag attributes, code,
+links or existing spans, and nested inline markup does not defeat a rule.
+Key points alone (all the PDF asks for) can also be marked by
+style_key_points, which tokenizes the markup the way the tree builder does
+but only inserts the labels instead of building and re-serialising a tree.
+
+Terminology pills are looked up word by word in a dictionary instead of one
+regex per term, so a dictionary with thousands of terms costs about the same
+as one with ten.
+"""
+
+import html
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+# Highlighted out of the box; users add their own in the terminology file
+DEFAULT_TERMS = [
+    'SMTP', 'Botnet', 'Botnets', 'Malware', 'Phishing', 'Ransomware',
+    'Firewall', 'VPN', 'DNS', 'HTTP', 'HTTPS', 'SSL', 'TLS', 'API',
+    'SQL', 'XSS', 'DDoS', 'DoS', 'IP', 'TCP', 'UDP', 'HTML', 'CSS',
+    'Harvesting', 'Spoofing', 'Encryption', 'Decryption', 'Authentication',
+    'Authorization', 'Trojan', 'Worm', 'Spyware', 'Adware', 'Keylogger'
+]
+
+# Words (and HTML entities, which are skipped) inside a text node
+TOKEN_RE = re.compile(r"&#?\w+;|\w+")
+WORD_RE = re.compile(r"\w+")
+# What may sit between the words of a multi-word term ("Man-in-the-Middle", "TCP/IP")
+JOINER_RE = re.compile(r"\s+|[-/.]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Inline styling is never applied inside these elements
+SKIP_TAGS = {"span", "code", "pre", "a", "script", "style", "kbd", "samp"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+QUOTED_RE = re.compile(r'"([^"]+)"')
+
+
+def normalize_term(term):
+    """Dictionary key for a term: lowercase with single spaces."""
+    return WHITESPACE_RE.sub(" ", term.strip()).lower()
+
+
+class TermMatcher:
+    """Finds dictionary terms in text with word-by-word lookups."""
+
+    def __init__(self, terms):
+        """
+        terms: iterable of terms to highlight. Matching is case-insensitive;
+        terms must start and end with a letter or digit.
+        """
+        self._terms = set()
+        self._max_words = {}  # first word -> most words in a term starting with it
+        for term in terms:
+            key = normalize_term(term)
+            words = [m.group(0) for m in TOKEN_RE.finditer(key)]
+            if not words or not key.startswith(words[0]) or not key.endswith(words[-1]):
+                continue
+            self._terms.add(key)
+            self._max_words[words[0]] = max(self._max_words.get(words[0], 0), len(words))
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, term):
+        return normalize_term(term) in self._terms
+
+    def find(self, text):
+        """Yield (start, end) spans of terms in text, longest match first, without overlaps."""
+        if self._max_words.keys().isdisjoint(WORD_RE.findall(text.lower())):
+            return  # the common case, decided without leaving C
+        tokens = [m for m in TOKEN_RE.finditer(text) if not m.group(0).startswith("&")]
+        i = 0
+        while i < len(tokens):
+            max_words = self._max_words.get(tokens[i].group(0).lower(), 0)
+            matched = 0
+            for n in range(min(max_words, len(tokens) - i), 0, -1):
+                last = tokens[i + n - 1]
+                if n > 1 and not all(
+                    JOINER_RE.fullmatch(text[tokens[k].end():tokens[k + 1].start()])
+                    for k in range(i, i + n - 1)
+                ):
+                    continue
+                if normalize_term(text[tokens[i].start():last.end()]) in self._terms:
+                    yield tokens[i].start(), last.end()
+                    matched = n
+                    break
+            i += matched or 1
+
+
+def load_terms(path):
+    """Terms from a one-per-line file (blank lines and # comments ignored), or the defaults."""
+    path = Path(path)
+    if not path.exists():
+        return list(DEFAULT_TERMS)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+def save_terms(path, terms):
+    """Write terms one per line, dropping duplicates (case-insensitive)."""
+    seen = set()
+    unique = []
+    for term in terms:
+        term = WHITESPACE_RE.sub(" ", term.strip())
+        if term and normalize_term(term) not in seen:
+            seen.add(normalize_term(term))
+            unique.append(term)
+    Path(path).write_text("\n".join(unique) + "\n", encoding="utf-8")
+    return unique
+
+
+# -----------------------------------------------------------------------------
+# Element tree
+# -----------------------------------------------------------------------------
+class Element:
+    """An HTML element. Children are Elements, Raw markup or text (kept HTML-escaped)."""
+
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag, attrs=None, children=None):
+        self.tag = tag
+        self.attrs = attrs or []
+        self.children = children or []
+
+    def text(self):
+        """Concatenated text of this element and its descendants."""
+        return "".join(
+            child.text() if isinstance(child, Element) else child
+            for child in self.children
+            if not isinstance(child, Raw)
+        )
+
+    def add_class(self, css_class):
+        for i, (name, value) in enumerate(self.attrs):
+            if name == "class":
+                self.attrs[i] = (name, f"{value} {css_class}" if value else css_class)
+                return
+        self.attrs.append(("class", css_class))
+
+
+class Raw(str):
+    """Markup passed through untouched (comments, doctypes, processing instructions)."""
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.root = Element(None)
+        self.stack = [self.root]
+
+    def _append_text(self, text):
+        children = self.stack[-1].children
+        if children and type(children[-1]) is str:
+            children[-1] += text
+        else:
+            children.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, attrs)
+        self.stack[-1].children.append(element)
+        if tag not in VOID_TAGS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].children.append(Element(tag, attrs))
+
+    def handle_endtag(self, tag):
+        # Close up to the matching element; stray end tags are dropped
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].tag == tag:
+                del self.stack[depth:]
+                return
+
+    def handle_data(self, data):
+        self._append_text(data)
+
+    def handle_entityref(self, name):
+        self._append_text(f"&{name};")
+
+    def handle_charref(self, name):
+        self._append_text(f"&#{name};")
+
+    def handle_comment(self, data):
+        self.stack[-1].children.append(Raw(f"<!--{data}-->"))
+
+    def handle_decl(self, decl):
+        self.stack[-1].children.append(Raw(f"<!{decl}>"))
+
+    def handle_pi(self, data):
+        self.stack[-1].children.append(Raw(f"<?{data}>"))
+
+
+def parse_html(markup):
+    """Parse an HTML fragment into an Element tree (the root has tag None)."""
+    builder = _TreeBuilder()
+    builder.feed(markup)
+    builder.close()
+    return builder.root
+
+
+def serialize(node):
+    """Turn an Element tree back into HTML."""
+    out = []
+    _serialize(node, out)
+    return "".join(out)
+
+
+def _serialize(node, out):
+    if node.tag is not None:
+        attrs = "".join(
+            f' {name}' if value is None else f' {name}="{html.escape(value)}"'
+            for name, value in node.attrs
+        )
+        if node.tag in VOID_TAGS:
+            out.append(f"<{node.tag}{attrs} />")
+            return
+        out.append(f"<{node.tag}{attrs}>")
+    for child in node.children:
+        if isinstance(child, Element):
+            _serialize(child, out)
+        else:
+            out.append(child)
+    if node.tag is not None:
+        out.append(f"</{node.tag}>")
+
+
+# -----------------------------------------------------------------------------
+# Styling stage
+# -----------------------------------------------------------------------------
+PREVIEW_FEATURES = frozenset({"key_points", "analogies", "concepts", "cards", "quotes", "pills"})
+PDF_FEATURES = frozenset({"key_points"})
+
+# Text before the first colon at the start of these elements is a key point,
+# also when the text is wrapped in emphasis ("**Definition:** ...")
+KEY_POINT_TAGS = {"p", "li", "td", "dd"}
+EMPHASIS_TAGS = {"strong", "em", "b", "i"}
+KEY_POINT_RE = re.compile(r"^(\s*)([^\W\d_][^:\n]{0,60}?)(\s*:)")
+ANALOGY_RE = re.compile(r"Analogy:|\([^)]*Analogy[^)]*\)|Real-World|Real World", re.IGNORECASE)
+CONCEPT_KINDS = [
+    # (css class, keyword pattern, heading levels)
+    ("summary", re.compile(r"Summary", re.IGNORECASE), ("h2", "h3")),
+    ("example", re.compile(r"Example", re.IGNORECASE), ("h2", "h3")),
+    ("mechanism", re.compile(r"Mechanism|How it works", re.IGNORECASE), ("h2",)),
+]
+# Markup in the order the tree builder reads it: comments, start and end tags
+# (quoted attribute values may hold ">"), declarations and processing instructions
+MARKUP_RE = re.compile(
+    r"<!--.*?(?:-->|\Z)"
+    r"|<(?P<end>/?)(?P<tag>[a-zA-Z][^\s/>]*)(?P<attrs>(?:[^>\"']|\"[^\"]*\"|'[^']*')*)>"
+    r"|<[!?][^>]*>",
+    re.DOTALL,
+)
+RAW_TEXT_TAGS = set(HTMLParser.CDATA_CONTENT_ELEMENTS)
+
+
+def style_tree(root, features=PREVIEW_FEATURES, matcher=None):
+    """Restyle an Element tree in place in one traversal; returns the root."""
+    if matcher is None:
+        features = features - {"pills"}
+    _style_children(root, features, matcher, skip=False)
+    return root
+
+
+def _style_children(node, features, matcher, skip):
+    if "key_points" in features and not skip and node.tag in KEY_POINT_TAGS:
+        _mark_key_point(node)
+
+    styled = []
+    for child in node.children:
+        if isinstance(child, Element):
+            _style_children(child, features, matcher, skip or child.tag in SKIP_TAGS)
+            styled.append(_style_block(child, features))
+        elif skip or isinstance(child, Raw):
+            styled.append(child)
+        else:
+            styled.extend(_style_text(child, features, matcher))
+    node.children = styled
+
+
+def _mark_key_point(node):
+    while node.children and isinstance(node.children[0], Element) and node.children[0].tag in EMPHASIS_TAGS:
+        node = node.children[0]
+    first = node.children[0] if node.children else None
+    match = KEY_POINT_RE.match(first) if type(first) is str else None
+    if match:
+        label = Element("span", [("class", "key-point")], [match.group(2)])
+        node.children[:1] = [match.group(1), label, first[match.end(2):]]
+
+
+def _style_block(element, features):
+    tag = element.tag
+    if tag == "blockquote" and "cards" in features:
+        return Element("div", [("class", "info-card")], [element])
+    if tag == "p" and "analogies" in features and ANALOGY_RE.search(element.text()):
+        return Element("div", [("class", "sticky-note")], [element])
+    if tag in ("h2", "h3") and "concepts" in features:
+        text = element.text()
+        for css_class, keyword, levels in CONCEPT_KINDS:
+            if tag in levels and keyword.search(text):
+                element.add_class(f"concept-header {css_class}")
+                break
+    return element
+
+
+def _style_text(text, features, matcher):
+    """Quoted text and pills for one text node, as a list of nodes."""
+    if "quotes" not in features:
+        return _pills(text, features, matcher)
+    nodes = []
+    pos = 0
+    for match in QUOTED_RE.finditer(text):
+        nodes.extend(_pills(text[pos:match.start()], features, matcher))
+        quoted = Element("span", [("class", "quoted-text")], ['"', *_pills(match.group(1), features, matcher), '"'])
+        nodes.append(quoted)
+        pos = match.end()
+    nodes.extend(_pills(text[pos:], features, matcher))
+    return nodes
+
+
+def _pills(text, features, matcher):
+    if "pills" not in features:
+        return [text]
+    nodes = []
+    pos = 0
+    for start, end in matcher.find(text):
+        nodes.append(text[pos:start])
+        nodes.append(Element("span", [("class", "term-pill")], [text[start:end]]))
+        pos = end
+    nodes.append(text[pos:])
+    return nodes
+
+
+def style_html(markup, matcher=None, features=PREVIEW_FEATURES):
+    """Parse, restyle and re-serialise rendered markdown."""
+    return serialize(style_tree(parse_html(markup), features, matcher))
+
+
+def style_key_points(markup):
+    """
+    Mark key points exactly as style_tree(..., PDF_FEATURES) does, without
+    building the tree.
+
+    The markup is tokenized by the tree builder's rules (comments, quoted
+    attribute values and script/style contents never count as tags) while a
+    stack of open elements is kept; only the labels are inserted and the rest
+    of the markup is left as it was.
+    """
+    out = []
+    pos = 0             # markup before this is already in out
+    stack = []          # tags of the open elements
+    skipped = 0         # how many of them are SKIP_TAGS
+    candidate = False   # the text that comes next may start a key point
+    text = []           # (start, end) of the candidate's text read so far
+    text_start = 0
+    while (token := MARKUP_RE.search(markup, text_start)) is not None:
+        if candidate and token.start() > text_start:
+            text.append((text_start, token.start()))
+        text_start = token.end()
+        tag = token.group("tag")
+        tag = tag and tag.lower()
+        if tag and token.group("end") and tag not in stack:
+            continue  # a stray end tag is dropped, joining the text around it, as by the tree builder
+        if text:
+            pos = _label_key_point(markup, text, pos, out)
+            if pos is None:
+                return serialize(style_tree(parse_html(markup), PDF_FEATURES))
+            candidate, text = False, []
+        if tag is None:
+            candidate = False  # comment, declaration or processing instruction
+        elif token.group("end"):
+            depth = len(stack) - 1 - stack[::-1].index(tag)
+            skipped -= sum(1 for open_tag in stack[depth:] if open_tag in SKIP_TAGS)
+            del stack[depth:]
+            candidate = False
+        elif tag in VOID_TAGS or token.group("attrs").endswith("/"):
+            candidate = False
+        else:
+            stack.append(tag)
+            if tag in SKIP_TAGS:
+                skipped += 1
+            if tag in RAW_TEXT_TAGS:
+                end_tag = re.compile(rf"</{tag}", re.IGNORECASE).search(markup, text_start)
+                text_start = len(markup) if end_tag is None else end_tag.start()
+            # Emphasis opened right at the start of an element keeps the key point open
+            candidate = not skipped and (tag in KEY_POINT_TAGS or (candidate and tag in EMPHASIS_TAGS))
+    if candidate and text_start < len(markup):
+        text.append((text_start, len(markup)))
+    if text:
+        pos = _label_key_point(markup, text, pos, out)
+        if pos is None:
+            return serialize(style_tree(parse_html(markup), PDF_FEATURES))
+    out.append(markup[pos:])
+    return "".join(out)
+
+
+def _label_key_point(markup, text, pos, out):
+    """
+    Label the key point at the start of a text node, given as the (start, end)
+    pieces of markup it is read from; returns the new copy position, or None
+    when the label would span a stray end tag.
+    """
+    key_point = KEY_POINT_RE.match("".join(markup[start:end] for start, end in text))
+    if key_point is None:
+        return pos
+    offset = 0
+    for start, end in text:
+        if key_point.start(2) < offset + end - start:
+            if key_point.end(2) > offset + end - start:
+                return None
+            out.append(markup[pos:start + key_point.start(2) - offset])
+            out.append(f'<span class="key-point">{key_point.group(2)}</span>')
+            return start + key_point.end(2) - offset
+        offset += end - start
+    return pos
@@ -0,0 +1,156 @@
+"""
+Durable queue of files waiting to be pushed to GitHub.
+
+The editor only records what changed, as file paths or references the app
+resolves later (such as a unit); a background thread turns them into files
+and pushes them. Pending pushes live in SQLite, so they survive app
+restarts. An entry queued again before its push goes out is stored once (the
+push always reads the files as they are at that moment), and everything due
+is sent as one commit. Failed pushes are retried with exponential backoff.
+"""
+
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    path TEXT PRIMARY KEY,  -- queued entry: a file path or a reference for files_for
+    message TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT
+);
+"""
+
+
+class SyncOutbox:
+    def __init__(self, db_path, sync, files_for=None, base_delay=5, max_delay=15 * 60):
+        """
+        db_path: SQLite file holding the queue
+        sync: GithubSync used to push (push_files)
+        files_for: turns a queued entry into the paths to push; runs on the
+            worker thread, so it may build files (default: entries are paths)
+        base_delay: seconds before the first retry, doubled on every failure
+        max_delay: longest wait between retries
+        """
+        self.sync = sync
+        self.files_for = files_for or (lambda entry: [entry])
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.last_sync = None   # time of the last successful push
+        self.last_result = None  # (ok, message) of the last attempt
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._wake = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="sync-outbox", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, entries, message):
+        """Queue entries to be pushed; an entry already waiting is kept once with the newest message."""
+        now = time.time()
+        rows = [(str(entry), message, now, now) for entry in entries if entry is not None]
+        with self._db_lock, self._db:
+            self._db.executemany(
+                """
+                INSERT INTO outbox (path, message, queued_at, next_attempt) VALUES (?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    message = excluded.message, queued_at = excluded.queued_at,
+                    attempts = 0, next_attempt = excluded.next_attempt, last_error = NULL
+                """,
+                rows,
+            )
+        self._wake.set()
+
+    def retry_now(self):
+        """Make every waiting push due immediately."""
+        with self._db_lock, self._db:
+            self._db.execute("UPDATE outbox SET next_attempt = ?", (time.time(),))
+        self._wake.set()
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+    def _run(self):
+        while True:
+            delay = self._drain()
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+
+    def _drain(self):
+        """Push everything that is due; returns seconds until the next entry is."""
+        now = time.time()
+        with self._db_lock:
+            due = self._db.execute(
+                "SELECT path, message, queued_at, attempts FROM outbox WHERE next_attempt <= ? ORDER BY queued_at",
+                (now,),
+            ).fetchall()
+        if due:
+            self._push(due)
+        with self._db_lock:
+            (next_attempt,) = self._db.execute("SELECT MIN(next_attempt) FROM outbox").fetchone()
+        return None if next_attempt is None else max(0.0, next_attempt - time.time())
+
+    def _push(self, due):
+        messages = list(dict.fromkeys(message for _, message, _, _ in due))
+        message = messages[-1] if len(messages) == 1 else f"{messages[-1]} (+{len(messages) - 1} more)"
+        try:
+            files = [path for entry, _, _, _ in due for path in self.files_for(entry)]
+            existing = [path for path in dict.fromkeys(files) if path is not None and Path(path).exists()]
+            if existing:
+                ok, result = self.sync.push_files(existing, message)
+                self.last_result = (ok, result)
+            else:
+                ok = True  # deleted since they were queued
+        except Exception as e:
+            ok, result = False, str(e)
+            self.last_result = (ok, result)
+
+        with self._db_lock, self._db:
+            if ok:
+                if existing:
+                    self.last_sync = time.time()
+                # Entries queued again while the push was running stay for the next round
+                self._db.executemany(
+                    "DELETE FROM outbox WHERE path = ? AND queued_at = ?",
+                    [(entry, queued_at) for entry, _, queued_at, _ in due],
+                )
+            else:
+                self._db.executemany(
+                    """
+                    UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ?
+                    WHERE path = ? AND queued_at = ?
+                    """,
+                    [
+                        (time.time() + self._retry_delay(attempts), result, entry, queued_at)
+                        for entry, _, queued_at, attempts in due
+                    ],
+                )
+
+    def _retry_delay(self, attempts):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempts)
+        return delay * random.uniform(0.5, 1.0)
+
+    def status(self):
+        """Queue depth, failing entries and the outcome of the last push, for the UI."""
+        with self._db_lock:
+            depth, failing, error = self._db.execute(
+                """
+                SELECT COUNT(*), SUM(attempts > 0),
+                       (SELECT last_error FROM outbox WHERE last_error IS NOT NULL ORDER BY queued_at DESC LIMIT 1)
+                FROM outbox
+                """
+            ).fetchone()
+        return {
+            "pending": depth,
+            "failing": failing or 0,
+            "last_error": error,
+            "last_sync": self.last_sync,
+            "last_result": self.last_result,
+        }
@@ -0,0 +1,31 @@
+import io
+
+from pypdf import PdfWriter
+
+from catalog import Catalog
+
+
+def make_pdf(pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=300)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_files_rewritten_in_place_are_reread(tmp_path):
+    root = tmp_path / "notes"
+    subject = root / "DBMS"
+    subject.mkdir(parents=True)
+    (subject / "Unit_1.md").write_text("short", encoding="utf-8")
+    (subject / "Unit_1.pdf").write_bytes(make_pdf(1))
+    catalog = Catalog(root, tmp_path / "catalog.sqlite3")
+    assert catalog.unit("DBMS", 1)["pages"] == 1
+
+    # Rewriting existing files leaves the folder's mtime alone
+    (subject / "Unit_1.md").write_text("a lot longer now", encoding="utf-8")
+    (subject / "Unit_1.pdf").write_bytes(make_pdf(3))
+
+    row = catalog.unit("DBMS", 1)
+    assert (row["md_bytes"], row["pages"]) == (16, 3)
@@ -0,0 +1,96 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import definitions
+from definitions import DefinitionError, DefinitionService, RateLimiter
+from glossary import OfflineGlossary
+
+
+@pytest.fixture
+def endpoint():
+    """generateContent stand-in; requests wait for `release` and are counted in `prompts`."""
+    state = {"prompts": [], "release": threading.Event()}
+    state["release"].set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            prompt = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["contents"][0]["parts"][0]["text"]
+            state["prompts"].append(prompt)
+            state["release"].wait(5)
+            term = prompt.rsplit(":", 1)[-1].strip()
+            body = json.dumps({"candidates": [{"content": {"parts": [{"text": f"{term} means something."}]}}]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/generateContent"
+    yield state
+    state["release"].set()
+    server.shutdown()
+
+
+def make_service(tmp_path, endpoint, **kwargs):
+    return DefinitionService(tmp_path / "definitions.sqlite3", endpoint=endpoint["url"], timeout=5, **kwargs)
+
+
+def test_definitions_are_cached(tmp_path, endpoint):
+    service = make_service(tmp_path, endpoint)
+    assert service.define("Botnets!", "Cyber_Security") == "Botnets means something."
+    assert service.define("botnets", "Cyber_Security") == "Botnets means something."
+    assert len(endpoint["prompts"]) == 1
+
+    # The cache outlives the service
+    assert make_service(tmp_path, endpoint).cached("BOTNETS", "Cyber_Security") == "Botnets means something."
+
+
+def test_concurrent_lookups_share_one_request(tmp_path, endpoint):
+    service = make_service(tmp_path, endpoint)
+    endpoint["release"].clear()
+    futures = [service.lookup("Phishing", "Cyber_Security") for _ in range(5)]
+    # Nobody waits on the network while the request is out
+    assert not any(future.done() for future in futures)
+    assert len({id(future) for future in futures}) == 1
+
+    endpoint["release"].set()
+    assert {future.result(timeout=5) for future in futures} == {"Phishing means something."}
+    assert len(endpoint["prompts"]) == 1
+
+
+def test_offline_glossary_answers_without_a_request(tmp_path, endpoint):
+    service = make_service(tmp_path, endpoint)
+    offline = OfflineGlossary([("Firewall", "Filters traffic.")])
+    future = service.lookup("firewalls", offline=offline)
+    assert future.done() and future.result() == "Filters traffic."
+    assert endpoint["prompts"] == []
+
+
+def test_rate_limit_turns_lookups_away(tmp_path, endpoint):
+    service = make_service(tmp_path, endpoint, rate_per_minute=1)
+    service.define("Worm")
+    with pytest.raises(DefinitionError, match="Too many lookups"):
+        service.define("Trojan")
+    assert len(endpoint["prompts"]) == 1
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(definitions.time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(2, per=60)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    now[0] += 29
+    assert not limiter.try_acquire()
+    now[0] += 1  # one token per 30 s
+    assert limiter.try_acquire()
+    now[0] += 600  # never more than the burst size
+    assert [limiter.try_acquire() for _ in range(3)] == [True, True, False]
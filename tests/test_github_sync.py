@@ -0,0 +1,325 @@
+import base64
+import hashlib
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+import github_sync
+import unit_store
+from github_sync import GithubSync, ShaCache, git_blob_sha
+
+
+def make_pdf(pages, width=200):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=width, height=300)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def blob_sha(data):
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+@pytest.fixture
+def remote():
+    """Serves a branch's tree listing and raw blobs; files maps repo path -> bytes."""
+    files = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if "/git/trees/" in path:
+                tree = [{"path": p, "type": "blob", "sha": blob_sha(data)} for p, data in files.items()]
+                body = json.dumps({"tree": tree, "truncated": False}).encode()
+                content_type = "application/json"
+            else:
+                body = next(data for data in files.values() if blob_sha(data) == path.rsplit("/", 1)[1])
+                content_type = "application/octet-stream"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield files, f"http://127.0.0.1:{server.server_port}/repos/user/notes"
+    server.shutdown()
+
+
+def test_pulled_unit_pdf_replaces_its_segments(tmp_path, monkeypatch, remote):
+    files, base_url = remote
+    monkeypatch.chdir(tmp_path)
+    subject = Path("Notes") / "DBMS"
+    unit_store.add_segment(subject, 1, make_pdf(1))
+    unit_store.add_segment(subject, 1, make_pdf(2))
+    pdf_path = unit_store.build_unit_pdf(subject, 1)
+
+    sync = GithubSync("token", "user/notes", sha_cache_dir=tmp_path / "shas", max_retries=0)
+    sync.base_url = base_url
+    repo_path = pdf_path.as_posix()
+    sync.shas.set(repo_path, git_blob_sha(pdf_path))  # last pushed copy
+    changed = make_pdf(5, width=400)
+    files[repo_path] = changed
+
+    def write(path, data):
+        if path.name == "Unit_1.pdf":
+            unit_store.replace_unit_pdf(path.parent, 1, data)
+        else:
+            sync.write_file(path, data)
+
+    ok, msg = sync.pull("Notes", write=write)
+
+    assert ok, msg
+    assert unit_store.build_unit_pdf(subject, 1).read_bytes() == changed
+    # The next save builds on the pulled file
+    unit_store.add_segment(subject, 1, make_pdf(1))
+    assert len(PdfReader(unit_store.build_unit_pdf(subject, 1)).pages) == 6
+
+
+def test_pull_keeps_local_edits(tmp_path, monkeypatch, remote):
+    files, base_url = remote
+    monkeypatch.chdir(tmp_path)
+    local = Path("Notes") / "DBMS" / "Unit_1.md"
+    local.parent.mkdir(parents=True)
+    local.write_bytes(b"synced")
+    sync = GithubSync("token", "user/notes", sha_cache_dir=tmp_path / "shas", max_retries=0)
+    sync.base_url = base_url
+    sync.shas.set(local.as_posix(), git_blob_sha(local))
+    files[local.as_posix()] = b"remote edit"
+    files["Notes/DBMS/Unit_2.md"] = b"new unit"
+
+    local.write_bytes(b"local edit")
+    ok, msg = sync.pull("Notes")
+
+    assert ok and "kept 1 local change" in msg
+    assert local.read_bytes() == b"local edit"
+    assert Path("Notes/DBMS/Unit_2.md").read_bytes() == b"new unit"
+
+
+def test_pull_saves_the_sha_cache_once(tmp_path, monkeypatch, remote):
+    files, base_url = remote
+    monkeypatch.chdir(tmp_path)
+    for unit in range(1, 41):
+        files[f"Notes/DBMS/Unit_{unit}.md"] = f"unit {unit}".encode()
+    sync = GithubSync("token", "user/notes", sha_cache_dir=tmp_path / "shas", max_retries=0)
+    sync.base_url = base_url
+    saves = []
+    save = sync.shas._save
+    monkeypatch.setattr(sync.shas, "_save", lambda: saves.append(save()))
+
+    ok, msg = sync.pull("Notes")
+
+    assert ok and msg == "Pulled 40 files"
+    assert len(saves) == 1
+    reloaded = ShaCache(sync.shas.path)
+    assert reloaded.get("Notes/DBMS/Unit_40.md") == blob_sha(b"unit 40")
+
+
+def test_blob_sha_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(github_sync, "BLOB_SHA_MEMO_ENTRIES", 3)
+    monkeypatch.setattr(github_sync, "_blob_sha_memo", github_sync.OrderedDict())
+    paths = []
+    for i in range(5):
+        paths.append(tmp_path / f"{i}.md")
+        paths[-1].write_bytes(b"x" * i)
+        assert git_blob_sha(paths[-1]) == blob_sha(b"x" * i)
+    git_blob_sha(paths[2])  # used again, so it outlives 3
+
+    git_blob_sha(paths[0])
+    assert [Path(key[0]).name for key in github_sync._blob_sha_memo] == ["4.md", "2.md", "0.md"]
+
+
+@pytest.fixture
+def git_remote():
+    """
+    Git Data API stand-in for push_files: refs, commits, trees and blobs.
+
+    state["failures"] holds (method, path fragment, status, headers) answered
+    once each before the real handler; state["race"] makes the next ref
+    update fail after someone else's commit lands.
+    """
+    state = {"blobs": {}, "trees": {"t0": {}}, "commits": {"c0": "t0"}, "head": "c0",
+             "failures": [], "race": False, "log": []}
+    lock = threading.Lock()
+
+    def new_tree(files, base_tree=None):
+        tree = dict(state["trees"][base_tree or state["commits"][state["head"]]])
+        tree.update(files)
+        tree_sha = f"t{len(state['trees'])}"
+        state["trees"][tree_sha] = tree
+        return tree_sha
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, body=None, headers=()):
+            data = json.dumps(body or {}).encode()
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def handle_any(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            path = self.path.split("?")[0].split("/repos/user/notes")[1]
+            with lock:
+                state["log"].append((self.command, path))
+                for failure in state["failures"]:
+                    if failure[0] == self.command and failure[1] in path:
+                        state["failures"].remove(failure)
+                        return self.reply(failure[2], {"message": "stub failure"}, failure[3])
+                if path == "/git/refs/heads/main" and self.command == "GET":
+                    return self.reply(200, {"object": {"sha": state["head"]}})
+                if path == "/git/refs/heads/main" and self.command == "PATCH":
+                    if state["race"]:
+                        state["race"] = False
+                        other = new_tree({"Notes/DBMS/Other.md": blob_sha(b"theirs")})
+                        state["commits"]["c-theirs"] = other
+                        state["head"] = "c-theirs"
+                        return self.reply(422, {"message": "Update is not a fast forward"})
+                    state["head"] = body["sha"]
+                    return self.reply(200, {"object": {"sha": body["sha"]}})
+                if path.startswith("/git/commits/"):
+                    return self.reply(200, {"tree": {"sha": state["commits"][path.rsplit("/", 1)[1]]}})
+                if path == "/git/commits":
+                    sha = f"c{len(state['commits'])}"
+                    state["commits"][sha] = body["tree"]
+                    return self.reply(201, {"sha": sha})
+                if path == "/git/trees":
+                    tree_sha = new_tree({entry["path"]: entry["sha"] for entry in body["tree"]}, body["base_tree"])
+                    return self.reply(201, {"sha": tree_sha})
+                if path == "/git/blobs":
+                    data = base64.b64decode(body["content"])
+                    state["blobs"][blob_sha(data)] = data
+                    return self.reply(201, {"sha": blob_sha(data)})
+            return self.reply(404, {"message": "Not Found"})
+
+        do_GET = do_POST = do_PATCH = handle_any
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def head_files():
+        return state["trees"][state["commits"][state["head"]]]
+
+    state["head_files"] = head_files
+    state["url"] = f"http://127.0.0.1:{server.server_port}/repos/user/notes"
+    yield state
+    server.shutdown()
+
+
+def make_pusher(tmp_path, git_remote, **kwargs):
+    sync = GithubSync("token", "user/notes", sha_cache_dir=tmp_path / "shas", backoff=0.01, **kwargs)
+    sync.base_url = git_remote["url"]
+    return sync
+
+
+def test_push_files_sends_only_changed_blobs_in_one_commit(tmp_path, monkeypatch, git_remote):
+    monkeypatch.chdir(tmp_path)
+    notes = Path("Notes") / "DBMS"
+    notes.mkdir(parents=True)
+    (notes / "Unit_1.md").write_bytes(b"one")
+    (notes / "Unit_2.md").write_bytes(b"two")
+    sync = make_pusher(tmp_path, git_remote)
+    paths = [notes / "Unit_1.md", notes / "Unit_2.md"]
+
+    assert sync.push_files(paths, "Save") == (True, "Synced 2 files to Cloud")
+    assert git_remote["head_files"]() == {"Notes/DBMS/Unit_1.md": blob_sha(b"one"),
+                                          "Notes/DBMS/Unit_2.md": blob_sha(b"two")}
+
+    git_remote["log"].clear()
+    assert sync.push_files(paths, "Save") == (True, "Already up to date")
+    assert git_remote["log"] == []
+
+    (notes / "Unit_2.md").write_bytes(b"two, edited")
+    assert sync.push_files(paths, "Save") == (True, "Synced 1 file to Cloud")
+    assert git_remote["log"].count(("POST", "/git/blobs")) == 1
+    assert git_remote["head_files"]()["Notes/DBMS/Unit_2.md"] == blob_sha(b"two, edited")
+
+
+def test_push_files_rebuilds_on_a_moved_branch(tmp_path, monkeypatch, git_remote):
+    monkeypatch.chdir(tmp_path)
+    note = Path("Notes") / "DBMS" / "Unit_1.md"
+    note.parent.mkdir(parents=True)
+    note.write_bytes(b"mine")
+    git_remote["race"] = True
+
+    ok, msg = make_pusher(tmp_path, git_remote).push_files([note], "Save")
+
+    assert ok, msg
+    # Our commit sits on top of theirs instead of replacing it
+    assert git_remote["head_files"]() == {"Notes/DBMS/Other.md": blob_sha(b"theirs"),
+                                          "Notes/DBMS/Unit_1.md": blob_sha(b"mine")}
+    assert git_remote["log"].count(("PATCH", "/git/refs/heads/main")) == 2
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Waits _request would have slept, without sleeping."""
+    waits = []
+    monkeypatch.setattr(github_sync.time, "sleep", waits.append)
+    return waits
+
+
+@pytest.mark.parametrize("status, headers, expected", [
+    (503, [], None),  # backoff with jitter
+    (429, [("Retry-After", "7")], 7.0),
+    (403, [("x-ratelimit-remaining", "0"), ("x-ratelimit-reset", "{reset}")], 31.0),
+])
+def test_request_retries_transient_failures(tmp_path, monkeypatch, git_remote, sleeps, status, headers, expected):
+    monkeypatch.chdir(tmp_path)
+    note = Path("Unit_1.md")
+    note.write_bytes(b"mine")
+    reset = str(int(github_sync.time.time()) + 30)
+    headers = [(name, value.format(reset=reset)) for name, value in headers]
+    git_remote["failures"] += [("GET", "/git/refs/heads/main", status, headers)] * 2
+
+    ok, msg = make_pusher(tmp_path, git_remote).push_files([note], "Save")
+
+    assert ok, msg
+    assert len(sleeps) == 2
+    if expected is None:
+        assert 0 <= sleeps[0] <= 0.01 and 0 <= sleeps[1] <= 0.02
+    else:
+        assert sleeps == [pytest.approx(expected, abs=1.5)] * 2
+
+
+def test_request_gives_up_on_a_long_retry_after(tmp_path, monkeypatch, git_remote, sleeps):
+    monkeypatch.chdir(tmp_path)
+    note = Path("Unit_1.md")
+    note.write_bytes(b"mine")
+    git_remote["failures"].append(("GET", "/git/refs/heads/main", 429, [("Retry-After", "3600")]))
+
+    ok, msg = make_pusher(tmp_path, git_remote, max_wait=60).push_files([note], "Save")
+
+    assert not ok and sleeps == []
+
+
+def test_request_retries_connection_errors(tmp_path, monkeypatch, sleeps):
+    monkeypatch.chdir(tmp_path)
+    note = Path("Unit_1.md")
+    note.write_bytes(b"mine")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    closed_url = f"http://127.0.0.1:{server.server_port}/repos/user/notes"
+    server.server_close()
+    sync = GithubSync("token", "user/notes", max_retries=2, backoff=0.01)
+    sync.base_url = closed_url
+
+    assert sync.push_files([note], "Save") == (False, "GitHub is unreachable")
+    assert len(sleeps) == 2
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+import md_log
+
+
+def test_read_text_skips_a_torn_write(tmp_path):
+    md_path = tmp_path / "Unit_1.md"
+    md_path.write_bytes(b"Notes from before the log\n\n")
+    md_log.append_entry(md_path, "first\n")
+    # A crash mid-append leaves a frame followed by part of its content
+    with open(md_path, "ab") as f:
+        f.write(md_log._frame(b"second entry\n", datetime.now()) + b"second en")
+    md_log.append_entry(md_path, "third\n")
+
+    assert md_log.read_text(md_path) == "Notes from before the log\n\nfirst\nthird\n"
+    assert [entry["content"] for entry in md_log.last_entries(md_path, 2)] == ["first\n", "third\n"]
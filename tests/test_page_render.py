@@ -0,0 +1,18 @@
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+
+import page_render
+
+
+def test_hash_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_render, "HASH_MEMO_ENTRIES", 2)
+    monkeypatch.setattr(page_render, "_hash_memo", OrderedDict())
+    pdf = tmp_path / "Unit_1.pdf"
+    for version in range(4):
+        pdf.write_bytes(b"%PDF" + bytes([version]) * (version + 1))
+        assert page_render.file_hash(pdf) == hashlib.sha256(pdf.read_bytes()).hexdigest()
+
+    # Only the newest versions of the rebuilt file are remembered
+    assert [key[1] for key in page_render._hash_memo] == [7, 8]
+    assert all(Path(key[0]) == pdf.resolve() for key in page_render._hash_memo)
@@ -0,0 +1,79 @@
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+import pdf_incremental
+from pdf_incremental import append_pdf
+
+
+def make_pdf(pages):
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_blank_page(width=200 + i, height=300)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_append_writes_an_incremental_update(tmp_path):
+    unit = tmp_path / "Unit_1.pdf"
+    unit.write_bytes(make_pdf(3))
+    before = unit.read_bytes()
+    inode = unit.stat().st_ino
+
+    revisions = append_pdf(unit, [make_pdf(2), make_pdf(1)], revisions=1)
+
+    after = unit.read_bytes()
+    assert revisions == 2
+    assert after.startswith(before)
+    reader = PdfReader(unit, strict=True)
+    assert [page.mediabox.width for page in reader.pages] == [200, 201, 202, 200, 201, 200]
+    assert unit.stat().st_ino == inode  # appended in place, not copied
+
+
+def test_update_size_does_not_grow_with_the_document(tmp_path):
+    unit = tmp_path / "Unit_1.pdf"
+    unit.write_bytes(make_pdf(1))
+    segment = make_pdf(1)
+    growth = []
+    revisions = 1
+    for _ in range(10):
+        size = unit.stat().st_size
+        revisions = append_pdf(unit, [segment], revisions, compact_after=100)
+        growth.append(unit.stat().st_size - size)
+    # Only the page tree root's /Kids array grows between updates
+    assert growth[-1] - growth[0] < 100
+    assert len(PdfReader(unit).pages) == 11
+
+
+def test_compacts_after_threshold(tmp_path):
+    unit = tmp_path / "Unit_1.pdf"
+    unit.write_bytes(make_pdf(1))
+    assert append_pdf(unit, [make_pdf(1)], revisions=2, compact_after=3) == 3
+    assert append_pdf(unit, [make_pdf(1)], revisions=3, compact_after=3) == 1
+    assert unit.read_bytes().count(b"%%EOF") == 1
+    assert len(PdfReader(unit).pages) == 3
+
+
+def test_falls_back_to_a_full_merge_for_xref_streams(tmp_path):
+    unit = tmp_path / "Unit_1.pdf"
+    writer = PdfWriter(PdfReader(io.BytesIO(make_pdf(2))), incremental=True)
+    writer.add_blank_page(width=100, height=100)
+    with open(unit, "wb") as f:
+        writer.write(f)
+
+    assert append_pdf(unit, [make_pdf(1)], revisions=2) == 1
+    assert len(PdfReader(unit).pages) == 4
+
+
+def test_a_failed_check_cuts_the_update_off(tmp_path, monkeypatch):
+    unit = tmp_path / "Unit_1.pdf"
+    unit.write_bytes(make_pdf(2))
+    sizes = []
+    monkeypatch.setattr(pdf_incremental, "_check_update", lambda path, *args: sizes.append(path.stat().st_size))
+    monkeypatch.setattr(pdf_incremental, "_replace", lambda path, data: sizes.append(path.stat().st_size))
+
+    assert append_pdf(unit, [make_pdf(1)]) == 1
+    # The merge starts from the original file, not the rejected update
+    written, merged_from = sizes
+    assert written > merged_from == len(make_pdf(2))
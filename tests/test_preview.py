@@ -0,0 +1,39 @@
+import re
+
+import markdown2
+import pytest
+
+from markdown_cache import MARKDOWN_EXTRAS, split_blocks
+from preview import PreviewRenderer
+
+SAMPLES = [
+    "<div>\n\nhello\n\n</div>\n\nafter",
+    "## Summary\n\none\n\n## Summary\n\ntwo\n\n## Summary\n\nthree",
+    "- a\n\n- b\n\n  more b\n\n```\ncode\n\nstill code\n```\n\n| x | y |\n|---|---|\n| 1 | 2 |",
+    "text[^1]\n\n[^1]: a footnote",
+]
+
+
+def squash(html):
+    return re.sub(r"\s+", "", html)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_blocks_render_like_the_whole_document(text):
+    whole = markdown2.markdown(text, extras=list(MARKDOWN_EXTRAS))
+    blocks = PreviewRenderer().render(text)
+    assert squash("".join(html for _, html in blocks)) == squash(whole)
+
+
+def test_html_block_is_kept_together():
+    assert split_blocks("<div>\n\nhello\n\n</div>\n\nafter") == ["<div>\n\nhello\n\n</div>", "after"]
+
+
+def test_renumbered_heading_changes_block_id():
+    renderer = PreviewRenderer()
+    alone = dict(renderer.render("## Summary\n\ntwo"))
+    both = renderer.render("## Summary\n\none\n\n## Summary\n\ntwo")
+    ids = [block_id for block_id, _ in both]
+    assert len(set(ids)) == len(ids)
+    assert ids[2] not in alone  # the second heading is now summary-2
+    assert 'id="summary-2"' in both[2][1]
@@ -0,0 +1,42 @@
+import threading
+import time
+
+import pytest
+
+from render_service import RenderService, RenderTimeout
+
+
+def test_a_timed_out_render_frees_its_worker():
+    service = RenderService(max_workers=1, job_timeout=1)
+    try:
+        with pytest.raises(RenderTimeout):
+            service.run(time.sleep, 30)
+        # The single worker is available again instead of still sleeping
+        started = time.monotonic()
+        assert service.run(abs, -3) == 3
+        assert time.monotonic() - started < 10
+    finally:
+        service.shutdown()
+
+
+def test_a_job_is_done_only_after_its_final_progress():
+    service = RenderService(max_workers=1)
+    try:
+        job = service.submit("noop", lambda progress: "ok")
+        while not job.done:
+            time.sleep(0.01)
+        assert (job.status, job.progress, job.result) == ("done", 1.0, "ok")
+    finally:
+        service.shutdown()
+
+
+def test_pages_do_not_wait_for_renders():
+    service = RenderService(max_workers=1, page_workers=1)
+    try:
+        busy = threading.Thread(target=service.run, args=(time.sleep, 5))
+        busy.start()
+        # The only render worker is taken; a page still goes straight through
+        assert service.submit_page(abs, -2).result(timeout=4) == 2
+        busy.join()
+    finally:
+        service.shutdown()
@@ -0,0 +1,35 @@
+import pytest
+
+import styling
+
+
+def tree_key_points(markup):
+    return styling.serialize(styling.style_tree(styling.parse_html(markup), styling.PDF_FEATURES))
+
+
+def test_pdf_key_points_match_the_tree_stage():
+    markup = (
+        '<h2>Summary</h2><p>Term: meaning with &amp; entity</p>'
+        '<ul><li><strong><em>Bold: point</em></strong></li><li>2024: not a key point</li></ul>'
+        '<p><code>Code: skipped</code> after</p><pre><p>Inside: pre</p></pre>'
+        '<span><span>nested</span><p>In: span</p></span><table><tr><td class="x">Cell: v</td></tr></table>'
+        '<p>After: the skipped elements</p>'
+    )
+    fast = styling.style_key_points(markup)
+
+    assert styling.serialize(styling.parse_html(fast)) == tree_key_points(markup)
+    assert fast.count('class="key-point"') == 4
+
+
+@pytest.mark.parametrize("markup, expected", [
+    # A ">" inside a quoted attribute value does not end the tag
+    ('<p title="a>b">Key: v</p>', '<p title="a>b"><span class="key-point">Key</span>: v</p>'),
+    # Nor is anything inside a comment markup
+    ('<!-- <p>Note: x</p> --><p>Real: y</p>', '<!-- <p>Note: x</p> --><p><span class="key-point">Real</span>: y</p>'),
+    ('<script>"<p>Code: z</p>"</script><p><b/>Not: one</p>', '<script>"<p>Code: z</p>"</script><p><b/>Not: one</p>'),
+])
+def test_pdf_key_points_tokenize_like_the_tree_builder(markup, expected):
+    fast = styling.style_key_points(markup)
+
+    assert fast == expected
+    assert styling.serialize(styling.parse_html(fast)) == tree_key_points(markup)
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from sync_outbox import SyncOutbox
+
+
+class StubSync:
+    """Records push_files calls; each waits for `release` and fails while `error` is set."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def push_files(self, paths, message):
+        self.calls.append(([str(path) for path in paths], message))
+        self.started.set()
+        self.release.wait(5)
+        if self.error:
+            return False, self.error
+        return True, "Synced"
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def notes(tmp_path):
+    paths = []
+    for name in ("Unit_1.md", "Unit_2.md"):
+        paths.append(tmp_path / name)
+        paths[-1].write_text(name, encoding="utf-8")
+    return [str(path) for path in paths]
+
+
+def test_entries_queued_during_a_push_are_coalesced_and_kept(tmp_path, notes):
+    sync = StubSync()
+    sync.release.clear()
+    outbox = SyncOutbox(tmp_path / "outbox.sqlite3", sync)
+    first, second = notes
+
+    outbox.enqueue([first], "Save 1")
+    assert sync.started.wait(5)
+    # While that push runs, the same file is saved twice more and another once
+    outbox.enqueue([first], "Save 2")
+    outbox.enqueue([first, second], "Save 3")
+    assert outbox.status()["pending"] == 2
+    sync.release.set()
+
+    wait_for(lambda: outbox.status()["pending"] == 0)
+    assert sync.calls == [([first], "Save 1"), ([first, second], "Save 3")]
+
+
+def test_failed_pushes_back_off_until_retried(tmp_path, notes):
+    sync = StubSync()
+    sync.error = "GitHub is unreachable"
+    outbox = SyncOutbox(tmp_path / "outbox.sqlite3", sync, base_delay=100, max_delay=1000)
+
+    def next_attempt():
+        with outbox._db_lock:
+            (next_attempt,) = outbox._db.execute("SELECT next_attempt FROM outbox").fetchone()
+        return next_attempt - time.time()
+
+    outbox.enqueue(notes[:1], "Save")
+    wait_for(lambda: outbox.status()["failing"] == 1)
+    assert 50 - 1 < next_attempt() <= 100
+    assert outbox.status()["last_error"] == "GitHub is unreachable"
+
+    # The delay doubles on every failure
+    outbox.retry_now()
+    wait_for(lambda: len(sync.calls) == 2 and next_attempt() > 1)
+    assert 100 - 1 < next_attempt() <= 200
+
+    sync.error = None
+    outbox.retry_now()
+    wait_for(lambda: outbox.status()["pending"] == 0)
+    assert len(sync.calls) == 3
+
+
+def test_entries_are_expanded_on_the_worker(tmp_path, notes):
+    sync = StubSync()
+    expanded_on = []
+
+    def files_for(entry):
+        expanded_on.append(threading.current_thread().name)
+        return notes if entry == "unit:DBMS/1" else [entry]
+
+    outbox = SyncOutbox(tmp_path / "outbox.sqlite3", sync, files_for=files_for)
+    outbox.enqueue(["unit:DBMS/1", notes[0]], "Save")
+
+    wait_for(lambda: outbox.status()["pending"] == 0)
+    assert sync.calls == [(notes, "Save")]
+    assert set(expanded_on) == {"sync-outbox"}
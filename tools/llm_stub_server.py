@@ -0,0 +1,75 @@
+"""
+Local stand-in for the Gemini generateContent endpoint.
+
+    python tools/llm_stub_server.py [--port 8765] [--delay 0.5]
+
+Then point the app at it in .streamlit/secrets.toml:
+
+    DEFINE_ENDPOINT = "http://127.0.0.1:8765/generateContent"
+
+Every request gets a canned answer naming the term (or, for glossary
+batches, a JSON object of them) after an optional delay, and the number of
+requests served is printed so caching and request coalescing can be checked
+by hand.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+served = 0
+served_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def do_POST(self):
+        global served
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            prompt = json.loads(self.rfile.read(length))["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError):
+            self.send_error(400, "Expected a generateContent request")
+            return
+        time.sleep(self.delay)
+        with served_lock:
+            served += 1
+            count = served
+        print(f"[{count}] {prompt}")
+
+        batch = [line[2:].strip() for line in prompt.splitlines() if line.startswith("- ")]
+        if batch:
+            # Glossary batch: a fenced JSON object, as the real model tends to reply
+            answers = {term: f"{term} (stub definition #{count})." for term in batch}
+            text = f"```json\n{json.dumps(answers, indent=2)}\n```"
+        else:
+            term = prompt.rsplit(":", 1)[-1].strip()
+            text = f"{term} (stub definition #{count})."
+        reply = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        body = json.dumps(reply).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds to wait before answering")
+    args = parser.parse_args()
+    StubHandler.delay = args.delay
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Serving stub definitions on http://127.0.0.1:{args.port}/generateContent")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Segmented storage for unit PDFs.
+
+Every append is stored as an immutable segment next to the unit:
+
+    DBMS/
+    ├── Unit_1.segments/
+    │   ├── manifest.json
+    │   ├── 3f2a9c...pdf        ← one rendered append (named by content hash)
+    │   └── 8b1e04...pdf
+    └── Unit_1.pdf              ← built lazily from the segments
+
+Saving a note only writes one small segment and the manifest. Unit_N.pdf is
+built when someone reads it and reused until the next segment lands. When
+only new segments were added since the last build they are appended as an
+incremental update instead of rebuilding the file.
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+from pdf_incremental import append_pdf
+
+MANIFEST_NAME = "manifest.json"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _unit_lock(subject_path, unit):
+    """One lock per unit so concurrent saves don't race on the manifest."""
+    key = (str(Path(subject_path).resolve()), str(unit))
+    with _locks_guard:
+        return _locks.setdefault(key, threading.RLock())
+
+
+def unit_pdf_path(subject_path, unit):
+    return Path(subject_path) / f"Unit_{unit}.pdf"
+
+
+def segments_dir(subject_path, unit):
+    return Path(subject_path) / f"Unit_{unit}.segments"
+
+
+def load_manifest(subject_path, unit):
+    """Return the unit manifest, or None for units without segments."""
+    manifest_path = segments_dir(subject_path, unit) / MANIFEST_NAME
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _save_manifest(subject_path, unit, manifest):
+    manifest_path = segments_dir(subject_path, unit) / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(MANIFEST_NAME + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+
+
+def _write_segment(seg_dir, pdf_bytes):
+    """Store pdf_bytes as a segment (deduplicated by content) and describe it."""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    name = f"{digest[:32]}.pdf"
+    seg_path = seg_dir / name
+    if not seg_path.exists():
+        tmp_path = seg_dir / f".{name}.tmp"
+        tmp_path.write_bytes(pdf_bytes)
+        os.replace(tmp_path, seg_path)
+    return {
+        "file": name,
+        "sha256": digest,
+        "pages": len(PdfReader(io.BytesIO(pdf_bytes)).pages),
+        "bytes": len(pdf_bytes),
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _new_manifest(subject_path, unit):
+    """Start a manifest, adopting an existing single-file Unit_N.pdf as the first segment."""
+    seg_dir = segments_dir(subject_path, unit)
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"version": 1, "segments": [], "previous": None, "built": None}
+    legacy_pdf = unit_pdf_path(subject_path, unit)
+    if legacy_pdf.exists():
+        manifest["segments"].append(_write_segment(seg_dir, legacy_pdf.read_bytes()))
+        manifest["built"] = _built_info(legacy_pdf, manifest["segments"])
+    return manifest
+
+
+def _built_info(pdf_path, segments, revisions=1):
+    stat = pdf_path.stat()
+    return {
+        "segments": [seg["file"] for seg in segments],
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "revisions": revisions,  # original + incremental updates, for compaction
+    }
+
+
+def add_segment(subject_path, unit, pdf_bytes, overwrite=False):
+    """
+    Record a newly rendered append for a unit.
+
+    overwrite=True replaces all existing segments. The previous segment list
+    is kept so the change can be undone.
+    """
+    with _unit_lock(subject_path, unit):
+        manifest = load_manifest(subject_path, unit) or _new_manifest(subject_path, unit)
+        segment = _write_segment(segments_dir(subject_path, unit), pdf_bytes)
+        manifest["previous"] = manifest["segments"]
+        manifest["segments"] = [segment] if overwrite else manifest["segments"] + [segment]
+        _save_manifest(subject_path, unit, manifest)
+        _collect_garbage(subject_path, unit, manifest)
+        return segment
+
+
+def has_segments(subject_path, unit):
+    manifest = load_manifest(subject_path, unit)
+    return bool(manifest and manifest["segments"])
+
+
+def undo(subject_path, unit):
+    """Go back to the segment list before the last change. Returns False if there is none."""
+    with _unit_lock(subject_path, unit):
+        manifest = load_manifest(subject_path, unit)
+        if not manifest or manifest["previous"] is None:
+            return False
+        manifest["segments"] = manifest["previous"]
+        manifest["previous"] = None
+        _save_manifest(subject_path, unit, manifest)
+        _collect_garbage(subject_path, unit, manifest)
+        return True
+
+
+def build_unit_pdf(subject_path, unit):
+    """
+    Return the path of an up-to-date Unit_N.pdf, building it if needed.
+
+    Units without segments are returned as-is (None if there is no PDF).
+    """
+    pdf_path = unit_pdf_path(subject_path, unit)
+    with _unit_lock(subject_path, unit):
+        manifest = load_manifest(subject_path, unit)
+        if manifest is None:
+            return pdf_path if pdf_path.exists() else None
+        segments = manifest["segments"]
+        if not segments:
+            pdf_path.unlink(missing_ok=True)
+            return None
+
+        wanted = [seg["file"] for seg in segments]
+        built = manifest["built"]
+        if built and pdf_path.exists():
+            stat = pdf_path.stat()
+            intact = (stat.st_size, stat.st_mtime_ns) == (built["size"], built["mtime_ns"])
+        else:
+            intact = False
+
+        if intact and built["segments"] == wanted:
+            return pdf_path
+
+        seg_dir = segments_dir(subject_path, unit)
+        done = len(built["segments"]) if intact else 0
+        if intact and wanted[:done] == built["segments"]:
+            # Only new segments since the last build: append them as one update
+            new_pdfs = [(seg_dir / name).read_bytes() for name in wanted[done:]]
+            revisions = append_pdf(pdf_path, new_pdfs, built.get("revisions", 1))
+        else:
+            revisions = 1
+            writer = PdfWriter()
+            for name in wanted:
+                writer.append(str(seg_dir / name))
+            tmp_path = pdf_path.with_name(pdf_path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                writer.write(f)
+            os.replace(tmp_path, pdf_path)
+
+        manifest["built"] = _built_info(pdf_path, segments, revisions)
+        _save_manifest(subject_path, unit, manifest)
+        return pdf_path
+
+
+def replace_unit_pdf(subject_path, unit, pdf_bytes):
+    """
+    Replace Unit_N.pdf with a copy made elsewhere (e.g. pulled from GitHub).
+
+    The new file becomes the unit's source of truth: its segments are
+    dropped, so it is not rebuilt from them, and the next save adopts it as
+    the first segment.
+    """
+    pdf_path = unit_pdf_path(subject_path, unit)
+    with _unit_lock(subject_path, unit):
+        seg_dir = segments_dir(subject_path, unit)
+        # Manifest first: without it the unit is a plain single-file PDF
+        (seg_dir / MANIFEST_NAME).unlink(missing_ok=True)
+        tmp_path = pdf_path.with_name(pdf_path.name + ".tmp")
+        tmp_path.write_bytes(pdf_bytes)
+        os.replace(tmp_path, pdf_path)
+        shutil.rmtree(seg_dir, ignore_errors=True)
+
+
+def _collect_garbage(subject_path, unit, manifest):
+    """Delete segment files no longer referenced by the current or previous list."""
+    keep = {seg["file"] for seg in manifest["segments"]}
+    keep.update(seg["file"] for seg in manifest["previous"] or [])
+    for seg_path in segments_dir(subject_path, unit).glob("*.pdf"):
+        if seg_path.name not in keep:
+            seg_path.unlink(missing_ok=True)